@@ -0,0 +1 @@
+"""Data, cleaning and modelling helpers shared by the Streamlit pages."""
@@ -0,0 +1,243 @@
+"""Air Quality Index and exceedance statistics.
+
+Sub-indices follow China's HJ 633-2012 and the US EPA AQI (2024 PM2.5
+breakpoints). Each breakpoint table is a set of linear segments and a whole
+column is mapped at once with ``np.searchsorted``; rolling 8 h / 24 h means
+per station come from cumulative sums, so the full multi-station history is
+indexed in a fraction of a second.
+
+Concentrations are the dataset's µg/m³ (CO included). HJ 633 takes CO in
+mg/m³ and the EPA gases in ppm/ppb, converted at 25 °C and 1 atm. Readings
+must be one row per station and hour, in time order within each station.
+
+    python -m airquality.aqi --standard EPA
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from airquality import store
+
+STANDARDS = ["HJ633", "EPA"]
+THRESHOLD = 100
+
+# Molar volume (L/mol) at 25 °C, 1 atm, and molecular weights for µg/m³ -> ppb
+MOLAR_VOLUME = 24.45
+MOLECULAR_WEIGHT = {"SO2": 64.07, "NO2": 46.01, "CO": 28.01, "O3": 48.00}
+
+# Averaging windows in hours (with the minimum number of valid hours)
+WINDOWS = {1: 1, 8: 6, 24: 20}
+
+
+class Table:
+    """Piecewise-linear breakpoint table: concentration segments to index segments."""
+
+    def __init__(self, concentrations, indices, decimals=None, upper=None):
+        # Either contiguous breakpoints, or (low, high) pairs with gaps as printed by the EPA
+        concentrations = np.asarray(concentrations, dtype="float64")
+        indices = np.asarray(indices, dtype="float64")
+        if concentrations.ndim == 1:
+            concentrations = np.column_stack([concentrations[:-1], concentrations[1:]])
+            indices = np.column_stack([indices[:-1], indices[1:]])
+        self.c_lo, self.c_hi = concentrations.T
+        self.i_lo, self.i_hi = indices.T
+        self.decimals = decimals
+        # Above the last breakpoint: the top index, or NaN when another averaging period takes over
+        self.upper = upper
+
+    def __call__(self, conc):
+        c = np.asarray(conc, dtype="float64")
+        if self.decimals is not None:
+            # The EPA truncates concentrations to the table's precision before the lookup
+            scale = 10.0 ** self.decimals
+            c = np.floor(c * scale + 1e-9) / scale
+        k = np.clip(np.searchsorted(self.c_lo, c, side="right") - 1, 0, len(self.c_lo) - 1)
+        c_lo, c_hi, i_lo, i_hi = self.c_lo[k], self.c_hi[k], self.i_lo[k], self.i_hi[k]
+        out = (i_hi - i_lo) / (c_hi - c_lo) * (np.minimum(c, c_hi) - c_lo) + i_lo
+        out[c > self.c_hi[-1]] = self.upper if self.upper is not None else np.nan
+        # Below the first segment (or missing): this averaging period does not define an index
+        out[~(c >= self.c_lo[0])] = np.nan
+        return out
+
+
+HJ633_INDEX = [0, 50, 100, 150, 200, 300, 400, 500]
+EPA_INDEX = [(0, 50), (51, 100), (101, 150), (151, 200), (201, 300), (301, 500)]
+
+# (pollutant, averaging hours) -> Table; CO in mg/m³, the rest in µg/m³. Where a
+# pollutant has two tables the higher sub-index applies; hourly SO2 above 800 µg/m³
+# has no hourly index in HJ 633 and is left blank.
+HJ633 = {
+    ("PM2.5", 24): Table([0, 35, 75, 115, 150, 250, 350, 500], HJ633_INDEX, upper=500),
+    ("PM10", 24): Table([0, 50, 150, 250, 350, 420, 500, 600], HJ633_INDEX, upper=500),
+    ("SO2", 1): Table([0, 150, 500, 650, 800], HJ633_INDEX[:5]),
+    ("NO2", 1): Table([0, 100, 200, 700, 1200, 2340, 3090, 3840], HJ633_INDEX, upper=500),
+    ("CO", 1): Table([0, 5, 10, 35, 60, 90, 120, 150], HJ633_INDEX, upper=500),
+    ("O3", 1): Table([0, 160, 200, 300, 400, 800, 1000, 1200], HJ633_INDEX, upper=500),
+    ("O3", 8): Table([0, 100, 160, 215, 265, 800], HJ633_INDEX[:6]),
+}
+
+# CO and O3 in ppm, SO2 and NO2 in ppb, particles in µg/m³
+EPA = {
+    ("PM2.5", 24): Table([(0.0, 9.0), (9.1, 35.4), (35.5, 55.4), (55.5, 125.4), (125.5, 225.4), (225.5, 325.4)],
+                         EPA_INDEX, decimals=1, upper=500),
+    ("PM10", 24): Table([(0, 54), (55, 154), (155, 254), (255, 354), (355, 424), (425, 604)],
+                        EPA_INDEX, decimals=0, upper=500),
+    ("O3", 8): Table([(0.000, 0.054), (0.055, 0.070), (0.071, 0.085), (0.086, 0.105), (0.106, 0.200)],
+                     EPA_INDEX[:5], decimals=3),
+    ("O3", 1): Table([(0.125, 0.164), (0.165, 0.204), (0.205, 0.404), (0.405, 0.604)],
+                     EPA_INDEX[2:], decimals=3, upper=500),
+    ("CO", 8): Table([(0.0, 4.4), (4.5, 9.4), (9.5, 12.4), (12.5, 15.4), (15.5, 30.4), (30.5, 50.4)],
+                     EPA_INDEX, decimals=1, upper=500),
+    ("SO2", 1): Table([(0, 35), (36, 75), (76, 185), (186, 304)], EPA_INDEX[:4], decimals=0),
+    ("SO2", 24): Table([(305, 604), (605, 1004)], EPA_INDEX[4:], decimals=0, upper=500),
+    ("NO2", 1): Table([(0, 53), (54, 100), (101, 360), (361, 649), (650, 1249), (1250, 2049)],
+                      EPA_INDEX, decimals=0, upper=500),
+}
+
+TABLES = {"HJ633": HJ633, "EPA": EPA}
+
+CATEGORIES = {
+    "HJ633": ["Excellent", "Good", "Lightly polluted", "Moderately polluted", "Heavily polluted", "Severely polluted"],
+    "EPA": ["Good", "Moderate", "Unhealthy for sensitive groups", "Unhealthy", "Very unhealthy", "Hazardous"],
+}
+CATEGORY_BOUNDS = [50, 100, 150, 200, 300]
+
+
+def convert(pollutant, values, standard):
+    """Dataset µg/m³ to the unit of ``standard``'s table for ``pollutant``."""
+    if pollutant == "CO":
+        mg = values / 1000
+        return mg if standard == "HJ633" else mg * MOLAR_VOLUME / MOLECULAR_WEIGHT["CO"]
+    if standard == "EPA" and pollutant in MOLECULAR_WEIGHT:
+        ppb = values * MOLAR_VOLUME / MOLECULAR_WEIGHT[pollutant]
+        return ppb / 1000 if pollutant == "O3" else ppb
+    return values
+
+
+def rolling_mean(values, starts, window, min_periods):
+    """Trailing ``window``-row mean within each group (groups begin at the row offsets ``starts``)."""
+    values = np.asarray(values, dtype="float64")
+    valid = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    idx = np.arange(len(values))
+    # Window start, not reaching back past the start of the row's own group
+    group_start = np.repeat(starts, np.diff(np.append(starts, len(values))))
+    lo = np.maximum(idx + 1 - window, group_start)
+    n = counts[idx + 1] - counts[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums[idx + 1] - sums[lo]) / n
+    means[n < min_periods] = np.nan
+    return means
+
+
+def group_starts(stations):
+    """Row offsets where a new station begins, for rows sorted by station."""
+    codes = pd.factorize(stations)[0]
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+
+def hourly(df, standard="HJ633"):
+    """Hourly AQI per station: every sub-index, the overall AQI, its primary pollutant and category.
+
+    ``df`` holds ``station``, ``datetime`` and the pollutant columns.
+    """
+    df = df.sort_values(["station", "datetime"], kind="stable", ignore_index=True)
+    starts = group_starts(df["station"].to_numpy())
+    averages = {}
+    sub = {}
+    for (pollutant, hours), table in TABLES[standard].items():
+        key = (pollutant, hours)
+        if key not in averages:
+            raw = df[pollutant].to_numpy(dtype="float64")
+            averages[key] = raw if hours == 1 else rolling_mean(raw, starts, hours, WINDOWS[hours])
+        index = table(convert(pollutant, averages[key], standard))
+        # Several tables for one pollutant (e.g. O3 1 h and 8 h): the higher sub-index applies
+        sub[pollutant] = index if pollutant not in sub else np.fmax(sub[pollutant], index)
+
+    pollutants = [p for p in store.POLLUTANTS if p in sub]
+    matrix = np.column_stack([sub[p] for p in pollutants])
+    has_any = ~np.isnan(matrix).all(axis=1)
+    value = np.full(len(df), np.nan)
+    value[has_any] = np.nanmax(matrix[has_any], axis=1)
+    primary = np.full(len(df), -1)
+    primary[has_any] = np.nanargmax(matrix[has_any], axis=1)
+
+    out = df[[c for c in ["station", "station_type", "datetime"] if c in df.columns]].copy()
+    for p in pollutants:
+        out[f"IAQI {p}"] = sub[p].astype("float32")
+    out["AQI"] = value.astype("float32")
+    out["primary"] = pd.Categorical.from_codes(primary, categories=pollutants)
+    out["category"] = categorize(value, standard)
+    return out
+
+
+def categorize(values, standard="HJ633"):
+    values = np.asarray(values, dtype="float64")
+    codes = np.searchsorted(CATEGORY_BOUNDS, np.ceil(values), side="left")
+    codes[np.isnan(values)] = -1
+    return pd.Categorical.from_codes(codes, categories=CATEGORIES[standard])
+
+
+def daily(aqi, threshold=THRESHOLD):
+    """Per station and day: mean/max AQI, hours above ``threshold`` and hours per category."""
+    keys = [c for c in ["station", "station_type"] if c in aqi.columns]
+    categories = list(aqi["category"].cat.categories)
+    # One indicator column per category, summed per day with the other aggregates
+    hits = aqi["category"].cat.codes.to_numpy()[:, None] == np.arange(len(categories))
+    frame = pd.concat([
+        aqi[keys],
+        aqi["datetime"].dt.floor("D").rename("date"),
+        aqi["AQI"],
+        (aqi["AQI"] > threshold).rename("over"),
+        pd.DataFrame(hits, columns=categories, index=aqi.index),
+    ], axis=1)
+    out = frame.groupby([*keys, "date"], observed=True).agg(
+        aqi_mean=("AQI", "mean"), aqi_max=("AQI", "max"), hours_over=("over", "sum"),
+        **{c: (c, "sum") for c in categories},
+    )
+    out["day_over"] = out["aqi_mean"] > threshold
+    return out.reset_index()
+
+
+def monthly(days):
+    """Monthly exceedance counts from :func:`daily`: hours above the threshold and days whose mean AQI was."""
+    keys = [c for c in ["station", "station_type"] if c in days.columns]
+    month = days["date"].dt.to_period("M").dt.to_timestamp().rename("month")
+    out = days.groupby([*keys, month], observed=True).agg(
+        exceedance_hours=("hours_over", "sum"),
+        exceedance_days=("day_over", "sum"),
+        days=("date", "size"),
+        aqi_mean=("aqi_mean", "mean"),
+    )
+    return out.reset_index()
+
+
+def load_readings(store_dir=store.STORE_DIR):
+    """Raw hourly readings of every station (extremes included), from the store."""
+    return store.read_dataset("raw", columns=["station", "station_type", "datetime", *store.POLLUTANTS],
+                              store_dir=store_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the AQI and exceedance counts of the station history.")
+    parser.add_argument("--standard", choices=STANDARDS, default="HJ633")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    args = parser.parse_args(argv)
+
+    df = load_readings(args.store_dir)
+    started = time.perf_counter()
+    aqi = hourly(df, args.standard)
+    months = monthly(daily(aqi, args.threshold))
+    elapsed = time.perf_counter() - started
+    totals = months.groupby("station", observed=True)[["exceedance_hours", "exceedance_days", "days"]].sum()
+    print(totals.to_string())
+    print(aqi["category"].value_counts(normalize=True).round(3).to_string())
+    print(f"{len(df):,} hourly readings indexed in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Cleaning pipeline that produces the ``clean`` dataset used by the dashboard.
+
+Reproduces the notebook steps (station-type median/mode imputation, then
+dropping rows where any pollutant has |z| >= 3 within its station type)
+with groupby-transform instead of per-group, per-column loops.
+
+    python -m airquality.cleaning
+"""
+import argparse
+import os
+from pathlib import Path
+
+from airquality import renders, rollups, store
+
+GROUP = "station_type"
+Z_THRESHOLD = 3
+NUMERIC_COLUMNS = store.POLLUTANTS + store.WEATHER
+CLEAN_COLUMNS = ["station", "station_type", "datetime", *NUMERIC_COLUMNS, "wd"]
+
+
+def group_modes(df, col, by=GROUP):
+    """Most frequent value of ``col`` per group (ties resolved by category order, as ``Series.mode``)."""
+    counts = df.groupby([by, col], observed=True).size()
+    counts = counts.sort_index().sort_values(ascending=False, kind="stable")
+    return counts.reset_index(level=col).groupby(level=0, observed=True)[col].first()
+
+
+def impute(df, by=GROUP):
+    """Fill numeric NaNs with the group median and ``wd`` with the group mode."""
+    df = df.copy()
+    groups = df.groupby(by, observed=True)
+    df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].fillna(groups[NUMERIC_COLUMNS].transform("median"))
+    modes = group_modes(df, "wd", by)
+    df["wd"] = df["wd"].fillna(df[by].map(modes).astype(df["wd"].dtype))
+    return df
+
+
+def zscore_mask(df, columns=store.POLLUTANTS, by=GROUP, threshold=Z_THRESHOLD):
+    """True for rows whose pollutants are all within ``threshold`` std devs of the group mean."""
+    groups = df.groupby(by, observed=True)[columns]
+    # ddof=0 to match scipy.stats.zscore used in the notebook
+    mean = groups.transform("mean")
+    std = groups.transform("std", ddof=0)
+    z = (df[columns] - mean) / std
+    return (z.abs() < threshold).all(axis=1)
+
+
+def clean(raw):
+    """Raw readings (as stored in the ``raw`` dataset) to the cleaned frame."""
+    df = impute(raw)
+    df = df[zscore_mask(df)]
+    return df[CLEAN_COLUMNS].reset_index(drop=True)
+
+
+def build_clean_store(store_dir=store.STORE_DIR, data_dir=store.DATA_DIR, csv_path=None):
+    """Rebuild the ``clean`` dataset from the raw store (written atomically)."""
+    store.ensure_raw_store(data_dir, store_dir)
+    raw = store.read_dataset("raw", columns=CLEAN_COLUMNS, store_dir=store_dir)
+    df = clean(raw)
+    path = store.write_dataset(df, "clean", store_dir)
+    rollups.save_all(df, store_dir)
+    # Incremental statistics describe the old history; they are refitted on next append
+    (Path(store_dir) / store.STATS_FILE).unlink(missing_ok=True)
+    if csv_path:
+        # Legacy flat export; written beside the target and renamed into place
+        tmp = Path(f"{csv_path}.tmp")
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, csv_path)
+    return path, df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the cleaned station dataset.")
+    parser.add_argument("--data-dir", default=str(store.DATA_DIR))
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    parser.add_argument("--csv", help="also export the cleaned rows to this CSV path")
+    parser.add_argument("--no-warm", action="store_true", help="skip pre-rendering the EDA figures")
+    args = parser.parse_args(argv)
+
+    path, df = build_clean_store(args.store_dir, args.data_dir, args.csv)
+    print(f"Wrote {len(df)} rows to {path}")
+    if not args.no_warm:
+        # The rollups changed, so the cached figures are stale; render the default view now
+        rendered = renders.warm(args.store_dir)
+        print(f"Pre-rendered {len(rendered)} figures in {sum(r[2] for r in rendered):.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Server-side downsampling of long time series before they are sent to Plotly.
+
+``minmax`` keeps the lowest and highest point of every bucket, so pollution
+peaks survive; ``lttb`` (Largest-Triangle-Three-Buckets) keeps the points that
+best preserve the visual shape. Both return indices into the input arrays.
+Scatter plots take a fixed per-group sample from the query layer instead.
+"""
+import numpy as np
+import pandas as pd
+
+# Roughly the plot area of a full-width chart; min/max keeps ~2 points per pixel column
+CHART_WIDTH_PX = 1200
+
+
+def minmax(y, n_out):
+    """Indices of the min and max point in each of ``n_out // 2`` equal-count buckets."""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(n_out // 2, 1)
+    bucket = np.arange(n) * n_buckets // n
+    # Sorted by (bucket, y): each bucket's first entry is its min, last entry its max
+    order = np.lexsort((y, bucket))
+    ends = np.flatnonzero(np.diff(bucket[order], append=n_buckets))
+    starts = np.r_[0, ends[:-1] + 1]
+    return np.unique(np.r_[0, order[starts], order[ends], n - 1])
+
+
+def lttb(x, y, n_out):
+    """Indices selected by Largest-Triangle-Three-Buckets; ``x`` must be numeric and sorted."""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    edges = np.linspace(1, n - 1, n_out - 1).astype("int64")
+    selected = np.empty(n_out, dtype="int64")
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(area.argmax())
+        selected[i + 1] = prev
+    return selected
+
+
+def downsample_frame(df, x, y, by=None, n_out=CHART_WIDTH_PX * 2, method="minmax"):
+    """Reduce each ``by`` series of ``df`` to at most about ``n_out`` points."""
+    groups = df.groupby(by, observed=True, sort=False) if by else [(None, df)]
+    parts = []
+    for _, group in groups:
+        group = group.sort_values(x)
+        if method == "lttb":
+            idx = lttb(group[x].to_numpy().astype("int64"), group[y].to_numpy(), n_out)
+        else:
+            idx = minmax(group[y].to_numpy(), n_out)
+        parts.append(group.iloc[idx])
+    return pd.concat(parts, ignore_index=True) if parts else df.iloc[:0]
@@ -0,0 +1,239 @@
+"""Streaming detection of pollution episodes in hourly station readings.
+
+The notebook drops |z| >= 3 readings as outliers; operationally those are
+the episodes to alert on. Each station keeps a constant amount of state: an
+EWMA level of log concentration, an hour-of-day offset around that level and
+an EWMA variance of the residual. A reading's score is its residual in
+standard deviations; working in log concentration makes it a relative rise,
+comparable between clean and polluted stations. An episode starts once the score stays at or above
+``z_start`` for ``min_hours`` readings and ends once it stays below ``z_end``
+for ``cooldown`` readings (or the feed has a gap, including a run of missing
+readings). While an episode is open
+the baseline adapts only slowly, so multi-day haze is not absorbed into it.
+
+Events are plain dicts::
+
+    {"event": "start", "station": ..., "start": ..., "time": ..., "value": ..., "zscore": ...}
+    {"event": "end", "station": ..., "start": ..., "end": ..., "hours": ...,
+     "peak": ..., "peak_zscore": ..., "mean": ..., "severity": ...}
+
+    python -m airquality.episodes --since 2016-10-01
+"""
+import argparse
+import math
+import time
+
+import pandas as pd
+
+from airquality import store
+
+POLLUTANT = "PM2.5"
+
+# Smoothing: the level follows about two weeks, the hour-of-day shape about a month
+LEVEL_ALPHA = 2 / (14 * 24 + 1)
+SEASONAL_ALPHA = 2 / (30 + 1)
+VARIANCE_ALPHA = 2 / (14 * 24 + 1)
+# Fraction of the normal update applied while an episode is open
+EPISODE_DAMPING = 0.1
+WARMUP_HOURS = 7 * 24
+MIN_STD = 0.05
+
+Z_START = 2.0
+Z_END = 1.0
+MIN_HOURS = 2
+COOLDOWN = 3
+MAX_GAP_HOURS = 6
+
+# (lowest peak z-score, label), most severe first
+SEVERITY = [(3.5, "severe"), (2.75, "high"), (Z_START, "moderate")]
+
+
+def severity(peak_zscore):
+    for threshold, label in SEVERITY:
+        if peak_zscore >= threshold:
+            return label
+    return SEVERITY[-1][1]
+
+
+class StationState:
+    """Rolling baseline and open-episode bookkeeping of one station."""
+
+    __slots__ = (
+        "level", "seasonal", "variance", "n", "last_time",
+        "above", "below", "candidate", "episode",
+    )
+
+    def __init__(self):
+        self.level = None
+        self.seasonal = [0.0] * 24
+        self.variance = None
+        self.n = 0
+        self.last_time = None
+        self.above = 0          # consecutive readings at or above z_start
+        self.below = 0          # consecutive readings below z_end during an episode
+        self.candidate = None   # episode being confirmed, same layout as ``episode``
+        self.episode = None     # open episode: [start, peak, peak_z, total, count, last_time]
+
+
+class EpisodeDetector:
+    """Per-station EWMA/seasonal anomaly scores turned into episode start/end events."""
+
+    def __init__(self, z_start=Z_START, z_end=Z_END, min_hours=MIN_HOURS, cooldown=COOLDOWN,
+                 max_gap_hours=MAX_GAP_HOURS, warmup_hours=WARMUP_HOURS):
+        self.z_start = z_start
+        self.z_end = z_end
+        self.min_hours = min_hours
+        self.cooldown = cooldown
+        self.max_gap = pd.Timedelta(hours=max_gap_hours).to_pytimedelta()
+        self.warmup = warmup_hours
+        self.states = {}
+
+    def update(self, station, when, value):
+        """Feed one reading; returns the list of events it triggers (usually empty)."""
+        state = self.states.get(station)
+        if state is None:
+            state = self.states[station] = StationState()
+        # Missing readings do not advance the clock, so an outage counts as a gap
+        if value is None or not math.isfinite(value):
+            return []
+        events = []
+        if state.last_time is not None and when - state.last_time > self.max_gap:
+            # A feed gap closes any open episode at the last reading before it
+            if state.episode is not None:
+                events.append(self._close(station, state))
+            state.above, state.candidate = 0, None
+        state.last_time = when
+
+        y = math.log1p(max(value, 0.0))
+        hour = when.hour
+        if state.level is None:
+            state.level, state.variance = y, MIN_STD ** 2
+        expected = state.level + state.seasonal[hour]
+        residual = y - expected
+        z = residual / max(math.sqrt(state.variance), MIN_STD)
+        state.n += 1
+
+        if state.n > self.warmup:
+            events.extend(self._track(station, state, when, value, z))
+
+        damping = EPISODE_DAMPING if state.episode is not None or state.above else 1.0
+        state.level += damping * LEVEL_ALPHA * (y - state.level)
+        state.seasonal[hour] += damping * SEASONAL_ALPHA * (y - state.level - state.seasonal[hour])
+        state.variance += damping * VARIANCE_ALPHA * (residual * residual - state.variance)
+        return events
+
+    def _track(self, station, state, when, value, z):
+        episode = state.episode
+        if episode is None:
+            if z < self.z_start:
+                state.above, state.candidate = 0, None
+                return []
+            state.above += 1
+            if state.candidate is None:
+                state.candidate = [when, value, z, 0.0, 0, when]
+            self._extend(state.candidate, when, value, z)
+            if state.above < self.min_hours:
+                return []
+            state.episode, state.candidate, state.below = state.candidate, None, 0
+            return [{"event": "start", "station": station, "start": state.episode[0], "time": when,
+                     "value": value, "zscore": z}]
+
+        if z < self.z_end:
+            state.below += 1
+            if state.below >= self.cooldown:
+                return [self._close(station, state)]
+            return []
+        state.below = 0
+        self._extend(episode, when, value, z)
+        return []
+
+    @staticmethod
+    def _extend(episode, when, value, z):
+        # [start, peak, peak_z, total, count, last_time]
+        if value > episode[1]:
+            episode[1] = value
+        if z > episode[2]:
+            episode[2] = z
+        episode[3] += value
+        episode[4] += 1
+        episode[5] = when
+
+    def _close(self, station, state):
+        start, peak, peak_z, total, count, last = state.episode
+        state.episode, state.above, state.below = None, 0, 0
+        return {
+            "event": "end", "station": station, "start": start, "end": last,
+            "hours": int((last - start).total_seconds() // 3600) + 1,
+            "peak": peak, "peak_zscore": peak_z, "mean": total / count, "severity": severity(peak_z),
+        }
+
+    def flush(self):
+        """End events for every episode still open (e.g. at the end of a replay)."""
+        return [self._close(station, state) for station, state in self.states.items()
+                if state.episode is not None]
+
+
+def detect(readings, detector=None, flush=True):
+    """Yield events for an iterable of ``(station, datetime, value)`` readings in time order."""
+    detector = detector or EpisodeDetector()
+    for station, when, value in readings:
+        yield from detector.update(station, when, value)
+    if flush:
+        yield from detector.flush()
+
+
+async def detect_async(readings, detector=None, flush=True):
+    """Async-iterator version of :func:`detect` for live feeds."""
+    detector = detector or EpisodeDetector()
+    async for station, when, value in readings:
+        for event in detector.update(station, when, value):
+            yield event
+    if flush:
+        for event in detector.flush():
+            yield event
+
+
+def history_readings(df, pollutant=POLLUTANT):
+    """Readings of a history frame as a time-ordered, station-interleaved feed."""
+    df = df.sort_values(["datetime", "station"], kind="stable")
+    stations = df["station"].astype(str).tolist()
+    times = df["datetime"].dt.to_pydatetime().tolist()
+    values = df[pollutant].astype("float64").tolist()
+    return zip(stations, times, values)
+
+
+def load_history(pollutant=POLLUTANT, store_dir=store.STORE_DIR):
+    """Raw (not outlier-filtered) readings of every station, from the store."""
+    return store.read_dataset("raw", columns=["station", "station_type", "datetime", pollutant],
+                              store_dir=store_dir)
+
+
+def episodes(df, pollutant=POLLUTANT, **params):
+    """Replay a history frame and return one row per completed episode."""
+    ends = [e for e in detect(history_readings(df, pollutant), EpisodeDetector(**params)) if e["event"] == "end"]
+    result = pd.DataFrame(ends, columns=["station", "start", "end", "hours", "peak", "peak_zscore", "mean", "severity"])
+    types = df.drop_duplicates("station")
+    types = dict(zip(types["station"].astype(str), types["station_type"].astype(str)))
+    result.insert(1, "station_type", result["station"].map(types))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the station history through the episode detector.")
+    parser.add_argument("--pollutant", default=POLLUTANT)
+    parser.add_argument("--since", help="only print episodes starting on or after this date")
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    args = parser.parse_args(argv)
+
+    df = load_history(args.pollutant, args.store_dir)
+    started = time.perf_counter()
+    result = episodes(df, args.pollutant)
+    elapsed = time.perf_counter() - started
+    if args.since:
+        result = result[result["start"] >= pd.Timestamp(args.since)]
+    print(result.to_string(index=False))
+    print(f"Replayed {len(df):,} readings in {elapsed:.2f}s ({len(df) / elapsed:,.0f} readings/s)")
+
+
+if __name__ == "__main__":
+    main()
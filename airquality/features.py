@@ -0,0 +1,154 @@
+"""Feature pipeline shared by training and the prediction page.
+
+Reproduces the notebook's model matrix (StandardScaler on the numeric
+readings, ``wind_*`` one-hot columns, the unscaled calendar ``month`` its
+monthly-trend cell adds, then ``station_*``/``station_type_*`` one-hot
+columns) with fixed vocabularies, and is saved next to the models so the page can build the
+exact ``feature_names_in_`` layout for real readings.
+
+    python -m airquality.features
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from airquality import store
+
+MODELS_DIR = Path("models")
+PIPELINE_FILE = "feature_pipeline.json"
+PIPELINE_VERSION = 2
+
+TARGET = "PM2.5"
+# Numeric inputs in the notebook's column order (the target is not an input)
+NUMERIC_FEATURES = ["PM10", "SO2", "NO2", "CO", "O3", "TEMP", "PRES", "DEWP", "RAIN", "WSPM"]
+# (input column, one-hot prefix), in the order pd.get_dummies appended them
+CATEGORICAL_FEATURES = [("wd", "wind"), ("station", "station"), ("station_type", "station_type")]
+# Calendar month (1-12), left unscaled as in the notebook; sits after the wind_* block
+MONTH = "month"
+
+
+class FeaturePipeline:
+    """Maps raw station readings to the model matrix; fit once, then transform batches."""
+
+    def __init__(self, mean, scale, vocabularies, version=PIPELINE_VERSION):
+        self.mean = np.asarray(mean, dtype="float64")
+        self.scale = np.asarray(scale, dtype="float64")
+        self.vocabularies = {col: list(values) for col, values in vocabularies.items()}
+        self.version = version
+        self._index = {col: {value: i for i, value in enumerate(values)}
+                       for col, values in self.vocabularies.items()}
+        # Position of each categorical block (and of the month) in the output matrix
+        self.feature_names = list(NUMERIC_FEATURES)
+        self._offsets = {}
+        for col, prefix in CATEGORICAL_FEATURES:
+            self._offsets[col] = len(self.feature_names)
+            self.feature_names += [f"{prefix}_{value}" for value in self.vocabularies[col]]
+            if col == "wd":
+                self._month = len(self.feature_names)
+                self.feature_names.append(MONTH)
+
+    @classmethod
+    def fit(cls, df):
+        """Fit the scaler and vocabularies on a cleaned frame."""
+        values = df[NUMERIC_FEATURES].to_numpy(dtype="float64")
+        scale = values.std(axis=0)
+        vocabularies = {
+            # Sorted, as pd.get_dummies orders its columns
+            col: sorted(str(v) for v in pd.unique(df[col].dropna()))
+            for col, _ in CATEGORICAL_FEATURES
+        }
+        return cls(values.mean(axis=0), np.where(scale == 0, 1.0, scale), vocabularies)
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    def transform(self, data):
+        """Feature matrix for a DataFrame or a mapping of column -> array-like.
+
+        The month is taken from a ``month`` column, else from ``datetime``.
+        Unknown category values get an all-zero one-hot block, as they would
+        with a dummy column that was never seen in training.
+        """
+        numeric = np.column_stack([np.asarray(data[col], dtype="float64") for col in NUMERIC_FEATURES])
+        n = len(numeric)
+        out = np.zeros((n, self.n_features), dtype="float64")
+        out[:, :len(NUMERIC_FEATURES)] = (numeric - self.mean) / self.scale
+        out[:, self._month] = _months(data)
+        rows = np.arange(n)
+        for col, _ in CATEGORICAL_FEATURES:
+            codes = self._codes(col, data[col])
+            known = codes >= 0
+            out[rows[known], self._offsets[col] + codes[known]] = 1.0
+        return out
+
+    def _codes(self, col, values):
+        """Vocabulary position of each value (-1 if unseen)."""
+        index = self._index[col]
+        if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+            # Map the few categories once, then gather by the integer codes
+            lookup = np.array([index.get(str(c), -1) for c in values.cat.categories] + [-1])
+            return lookup[values.cat.codes.to_numpy()]
+        return np.fromiter((index.get(str(v), -1) for v in values), dtype="int64", count=len(values))
+
+    def check(self, model):
+        """Raise if ``model`` was trained on a different feature layout."""
+        names = getattr(model, "feature_names_in_", None)
+        if names is not None and list(names) != self.feature_names:
+            raise ValueError(
+                f"Feature pipeline v{self.version} does not match the model's features; "
+                "retrain with `python -m airquality.training`, which refits both."
+            )
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "vocabularies": self.vocabularies,
+            "feature_names": self.feature_names,
+        }
+
+    def save(self, models_dir=MODELS_DIR):
+        path = Path(models_dir) / PIPELINE_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(self.to_dict(), indent=2))
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, models_dir=MODELS_DIR):
+        spec = json.loads((Path(models_dir) / PIPELINE_FILE).read_text())
+        if spec["version"] != PIPELINE_VERSION:
+            raise ValueError(
+                f"Feature pipeline v{spec['version']} predates the current layout (v{PIPELINE_VERSION}); "
+                "re-run `python -m airquality.training` to refit it and retrain the models."
+            )
+        return cls(spec["mean"], spec["scale"], spec["vocabularies"], spec["version"])
+
+
+def _months(data):
+    if MONTH in data:
+        return np.asarray(data[MONTH], dtype="float64")
+    return pd.DatetimeIndex(np.asarray(data["datetime"], dtype="datetime64[ns]")).month.to_numpy(dtype="float64")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit and save the feature pipeline from the clean dataset.")
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    parser.add_argument("--models-dir", default=str(MODELS_DIR))
+    args = parser.parse_args(argv)
+
+    columns = NUMERIC_FEATURES + [col for col, _ in CATEGORICAL_FEATURES]
+    df = store.read_dataset("clean", columns=columns, store_dir=args.store_dir)
+    pipeline = FeaturePipeline.fit(df)
+    print(f"Wrote {pipeline.save(args.models_dir)} ({pipeline.n_features} features)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Multi-day PM2.5 forecaster.
+
+Daily mean PM2.5 per station is modelled from lagged values, rolling means
+and calendar features with a single XGBoost model predicting the next day.
+Longer horizons are produced recursively, feeding each prediction back into
+the lag window. The last ``WINDOW`` days of every station are saved with the
+model (native XGBoost file plus a small JSON state), so a forecast never has
+to rescan the hourly history.
+
+    python -m airquality.forecast
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from airquality import features, model_io, store
+
+FORECAST_MODEL = "forecast_model"
+FORECAST_STATE = "forecast_state.json"
+MAX_HORIZON = 30
+
+LAGS = [1, 2, 3, 7, 14]
+ROLLING = [3, 7, 14]
+WINDOW = max(LAGS + ROLLING)
+FEATURE_NAMES = (
+    [f"lag_{k}" for k in LAGS]
+    + [f"mean_{w}" for w in ROLLING]
+    + ["std_7", "month", "dayofweek", "doy_sin", "doy_cos", "station"]
+)
+
+
+def daily_series(df):
+    """Daily mean PM2.5 per station on a gap-free calendar (dates as columns)."""
+    daily = df.groupby([df["station"].astype(str), df["datetime"].dt.floor("D")])["PM2.5"].mean()
+    wide = daily.unstack(level=0)
+    wide = wide.reindex(pd.date_range(wide.index.min(), wide.index.max(), freq="D"))
+    # Days emptied by outlier filtering are interpolated so the lags stay aligned
+    return wide.interpolate(limit_direction="both").T.astype("float64")
+
+
+def make_features(windows, dates, station_codes):
+    """Feature matrix from trailing windows (rows x WINDOW, oldest first) for the target ``dates``."""
+    windows = np.asarray(windows, dtype="float64")
+    dates = pd.DatetimeIndex(dates)
+    doy = 2 * np.pi * dates.dayofyear.to_numpy() / 365.25
+    columns = (
+        [windows[:, -k] for k in LAGS]
+        + [windows[:, -w:].mean(axis=1) for w in ROLLING]
+        + [windows[:, -7:].std(axis=1),
+           dates.month.to_numpy(), dates.dayofweek.to_numpy(), np.sin(doy), np.cos(doy),
+           np.asarray(station_codes)]
+    )
+    return np.column_stack(columns).astype("float64")
+
+
+def training_matrix(series):
+    """Every (station, day) with a full trailing window, as features and next-day targets."""
+    X, y = [], []
+    for code, values in enumerate(series.to_numpy()):
+        windows = sliding_window_view(values[:-1], WINDOW)
+        target_dates = series.columns[WINDOW:]
+        X.append(make_features(windows, target_dates, np.full(len(windows), code)))
+        y.append(values[WINDOW:])
+    return np.vstack(X), np.concatenate(y)
+
+
+class Forecaster:
+    """Next-day model plus the cached trailing window of every station."""
+
+    def __init__(self, model, stations, windows, last_date):
+        self.model = model
+        self.stations = list(stations)
+        self.windows = np.asarray(windows, dtype="float64")
+        self.last_date = pd.Timestamp(last_date)
+
+    @classmethod
+    def fit(cls, df, **params):
+        from xgboost import XGBRegressor
+
+        series = daily_series(df)
+        X, y = training_matrix(series)
+        model = XGBRegressor(
+            n_estimators=300, learning_rate=0.05, max_depth=5, subsample=0.8,
+            colsample_bytree=0.8, random_state=42, n_jobs=-1, **params,
+        )
+        model.fit(X, y)
+        return cls(model, series.index, series.to_numpy()[:, -WINDOW:], series.columns[-1])
+
+    def forecast_all(self, days=MAX_HORIZON):
+        """``days`` of recursive forecasts for every station (stations x days)."""
+        booster = self.model.get_booster()
+        windows = self.windows.copy()
+        codes = np.arange(len(self.stations))
+        dates = pd.date_range(self.last_date + pd.Timedelta(days=1), periods=days, freq="D")
+        out = np.empty((len(self.stations), days))
+        for step, date in enumerate(dates):
+            X = make_features(windows, [date] * len(codes), codes)
+            out[:, step] = np.maximum(booster.inplace_predict(X), 0)
+            windows = np.column_stack([windows[:, 1:], out[:, step]])
+        return pd.DataFrame(out, index=self.stations, columns=dates)
+
+    def forecast(self, station, days=MAX_HORIZON):
+        predictions = self.forecast_all(days).loc[station]
+        return pd.DataFrame({"date": predictions.index, "PM2.5": predictions.to_numpy()})
+
+    def history(self, station):
+        """The cached trailing daily values for ``station``."""
+        dates = pd.date_range(end=self.last_date, periods=WINDOW, freq="D")
+        return pd.DataFrame({"date": dates, "PM2.5": self.windows[self.stations.index(station)]})
+
+    def save(self, models_dir=features.MODELS_DIR):
+        models_dir = Path(models_dir)
+        models_dir.mkdir(parents=True, exist_ok=True)
+        path = model_io.save_model(self.model, models_dir / FORECAST_MODEL)
+        state = {"model_file": path.name, "stations": self.stations,
+                 "windows": self.windows.tolist(), "last_date": self.last_date.isoformat()}
+        tmp = models_dir / f".{FORECAST_STATE}.tmp"
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, models_dir / FORECAST_STATE)
+        return path
+
+    @classmethod
+    def load(cls, models_dir=features.MODELS_DIR):
+        state = json.loads((Path(models_dir) / FORECAST_STATE).read_text())
+        model = model_io.load_model(Path(models_dir) / state["model_file"])
+        return cls(model, state["stations"], state["windows"], state["last_date"])
+
+
+def version(models_dir=features.MODELS_DIR):
+    """Cache key of the saved forecaster: the state file's mtime, written after the model."""
+    return (Path(models_dir) / FORECAST_STATE).stat().st_mtime_ns
+
+
+def backtest(df, holdout_days=90, horizon=MAX_HORIZON):
+    """MAE of recursive forecasts made from the start of a held-out final period."""
+    cutoff = df["datetime"].max().floor("D") - pd.Timedelta(days=holdout_days)
+    forecaster = Forecaster.fit(df[df["datetime"] < cutoff])
+    predicted = forecaster.forecast_all(horizon)
+    actual = daily_series(df).reindex(index=predicted.index, columns=predicted.columns)
+    return float(np.nanmean(np.abs(predicted.to_numpy() - actual.to_numpy())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and save the daily PM2.5 forecaster.")
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    parser.add_argument("--models-dir", default=str(features.MODELS_DIR))
+    parser.add_argument("--backtest", action="store_true", help="also report the MAE on a held-out period")
+    args = parser.parse_args(argv)
+
+    df = store.read_dataset("clean", columns=["datetime", "station", "PM2.5"], store_dir=args.store_dir)
+    if args.backtest:
+        print(f"Backtest MAE over {MAX_HORIZON} days: {backtest(df):.2f}")
+    forecaster = Forecaster.fit(df)
+    print(f"Wrote {forecaster.save(args.models_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Incremental ingest of new hourly readings.
+
+Instead of re-reading and re-cleaning the whole history, a batch of new rows
+is imputed and outlier-filtered against running per-station-type statistics
+and appended to the ``raw`` and ``clean`` datasets as new files (the EDA
+rollups and the station metadata are updated from the same batch):
+
+* medians come from fixed-bin histograms of the observed (non-null) values,
+* the pollutant mean/std for the z-score rule are merged with Chan's
+  parallel update,
+* the ``wd`` mode comes from running category counts.
+
+Work per batch is proportional to the batch size. Rows already in the
+``clean`` dataset are not re-filtered when the statistics drift; run
+``python -m airquality.cleaning`` for a full rebuild.
+
+A batch must hold stations of ``--station-type`` in the station config
+(``data/stations.json``) and hours not yet stored for them; otherwise it is
+rejected before anything is written. Every append adds a file per touched
+partition, so once a dataset holds ``COMPACT_FILES`` of them ``main``
+rewrites it whole (``python -m airquality.store compact`` does the same).
+
+    python -m airquality.incremental new_rows.csv --station-type Urban
+"""
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from airquality import cleaning, ingest, renders, rollups, store
+
+BINS = 4096
+# Appended files a dataset may hold before main compacts it
+COMPACT_FILES = 50
+
+# Values outside store.COLUMN_RANGES fall into the end bins of the median sketch
+_LOW = np.array([store.COLUMN_RANGES[col][0] for col in cleaning.NUMERIC_COLUMNS], dtype="float64")
+_HIGH = np.array([store.COLUMN_RANGES[col][1] for col in cleaning.NUMERIC_COLUMNS], dtype="float64")
+
+
+class RunningStats:
+    """Per-group median sketch, pollutant moments and wind-direction counts."""
+
+    def __init__(self, bins=BINS):
+        self.bins = bins
+        self.hist = {}
+        self.count = {}
+        self.mean = {}
+        self.m2 = {}
+        self.wd_counts = {}
+
+    def _ensure(self, group):
+        if group not in self.hist:
+            n_cols, n_pol = len(cleaning.NUMERIC_COLUMNS), len(store.POLLUTANTS)
+            self.hist[group] = np.zeros((n_cols, self.bins), dtype="int64")
+            self.count[group] = 0
+            self.mean[group] = np.zeros(n_pol)
+            self.m2[group] = np.zeros(n_pol)
+            self.wd_counts[group] = np.zeros(len(store.WIND_DIRECTIONS), dtype="int64")
+
+    def update_observed(self, group, df):
+        """Add raw (pre-imputation) values to the median sketch and wd counts."""
+        self._ensure(group)
+        values = df[cleaning.NUMERIC_COLUMNS].to_numpy(dtype="float64")
+        missing = np.isnan(values)
+        scaled = np.nan_to_num((values - _LOW) / (_HIGH - _LOW) * self.bins)
+        idx = np.clip(scaled.astype("int64"), 0, self.bins - 1)
+        # Flatten (column, bin) so one bincount fills every column's histogram
+        flat = idx + np.arange(values.shape[1]) * self.bins
+        flat = flat[~missing]
+        self.hist[group] += np.bincount(flat, minlength=self.hist[group].size).reshape(self.hist[group].shape)
+
+        codes = df["wd"].cat.codes.to_numpy()
+        codes = codes[codes >= 0]
+        self.wd_counts[group] += np.bincount(codes, minlength=len(store.WIND_DIRECTIONS))
+
+    def update_moments(self, group, df):
+        """Merge the batch's pollutant mean/M2 (imputed values) into the running totals."""
+        self._ensure(group)
+        values = df[store.POLLUTANTS].to_numpy(dtype="float64")
+        n_b = len(values)
+        if n_b == 0:
+            return
+        mean_b = values.mean(axis=0)
+        m2_b = ((values - mean_b) ** 2).sum(axis=0)
+        n_a = self.count[group]
+        n = n_a + n_b
+        delta = mean_b - self.mean[group]
+        self.mean[group] = self.mean[group] + delta * n_b / n
+        self.m2[group] = self.m2[group] + m2_b + delta ** 2 * n_a * n_b / n
+        self.count[group] = n
+
+    def medians(self, group):
+        hist = self.hist[group]
+        cum = hist.cumsum(axis=1)
+        half = cum[:, -1] / 2
+        # First bin whose cumulative count reaches half the observations, then interpolate inside it
+        pos = (cum < half[:, None]).sum(axis=1).clip(0, self.bins - 1)
+        rows = np.arange(len(pos))
+        below = np.where(pos > 0, cum[rows, np.maximum(pos - 1, 0)], 0)
+        in_bin = np.maximum(hist[rows, pos], 1)
+        width = (_HIGH - _LOW) / self.bins
+        medians = _LOW + (pos + (half - below) / in_bin) * width
+        return pd.Series(np.where(cum[:, -1] > 0, medians, np.nan), index=cleaning.NUMERIC_COLUMNS)
+
+    def wd_mode(self, group):
+        return store.WIND_DIRECTIONS[int(self.wd_counts[group].argmax())]
+
+    def std(self, group):
+        return np.sqrt(self.m2[group] / max(self.count[group], 1))
+
+    def save(self, path):
+        arrays = {"bins": np.array(self.bins)}
+        for group in self.hist:
+            arrays[f"{group}/hist"] = self.hist[group]
+            arrays[f"{group}/count"] = np.array(self.count[group])
+            arrays[f"{group}/mean"] = self.mean[group]
+            arrays[f"{group}/m2"] = self.m2[group]
+            arrays[f"{group}/wd_counts"] = self.wd_counts[group]
+        path = Path(path)
+        tmp = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            stats = cls(int(data["bins"]))
+            for key in data.files:
+                if "/" not in key:
+                    continue
+                group, field = key.split("/")
+                value = data[key]
+                getattr(stats, field)[group] = int(value) if field == "count" else value.copy()
+        return stats
+
+
+def stats_path(store_dir=store.STORE_DIR):
+    return Path(store_dir) / store.STATS_FILE
+
+
+def fit_stats(raw):
+    """Running statistics equivalent to a full cleaning pass over ``raw``."""
+    stats = RunningStats()
+    imputed = cleaning.impute(raw)
+    for group, idx in raw.groupby(cleaning.GROUP, observed=True).groups.items():
+        stats.update_observed(group, raw.loc[idx])
+        stats.update_moments(group, imputed.loc[idx])
+    return stats
+
+
+def load_stats(store_dir=store.STORE_DIR):
+    """Load the saved statistics, fitting them from the raw store the first time."""
+    path = stats_path(store_dir)
+    if path.exists():
+        return RunningStats.load(path)
+    store.ensure_raw_store(store_dir=store_dir)
+    stats = fit_stats(store.read_dataset("raw", columns=cleaning.CLEAN_COLUMNS, store_dir=store_dir))
+    stats.save(path)
+    return stats
+
+
+def prepare_batch(batch, station_type):
+    """Coerce new rows to the raw store's schema."""
+    df = batch[[col for col in store.RAW_COLUMNS if col in batch.columns]]
+    df = df.astype({col: dtype for col, dtype in store.RAW_DTYPES.items() if col in df.columns})
+    df["station_type"] = pd.Categorical([station_type] * len(df), categories=store.STATION_TYPES)
+    df["datetime"] = pd.to_datetime(df[["year", "month", "day", "hour"]])
+    return df
+
+
+def check_batch(raw, station_type, stations, store_dir=store.STORE_DIR):
+    """Raise ``ValueError`` unless ``raw`` holds configured stations of ``station_type`` at hours not yet stored."""
+    names = sorted(raw["station"].dropna().astype(str).unique())
+    unknown = [name for name in names if name not in stations]
+    if unknown or raw["station"].isna().any():
+        raise ValueError(f"Stations {unknown} are not in the station config" if unknown else "Rows without a station")
+    wrong = [name for name in names if stations[name] != station_type]
+    if wrong:
+        raise ValueError(f"Stations {wrong} are not of station type {station_type!r} in the station config")
+    repeated = raw.duplicated(["station", "datetime"])
+    if repeated.any():
+        raise ValueError(f"Batch repeats {int(repeated.sum())} station hours")
+    # Only the batch's stations, years and time span are scanned
+    stored = store.read_dataset("raw", columns=["station", "datetime"], store_dir=store_dir, filters=[
+        ("station_type", "==", station_type),
+        ("year", "in", sorted(raw["datetime"].dt.year.unique().tolist())),
+        ("station", "in", names),
+        ("datetime", ">=", raw["datetime"].min()),
+        ("datetime", "<=", raw["datetime"].max()),
+    ])
+    stored_keys = pd.MultiIndex.from_arrays([stored["station"].astype(str), stored["datetime"]])
+    overlap = pd.MultiIndex.from_arrays([raw["station"].astype(str), raw["datetime"]]).isin(stored_keys)
+    if overlap.any():
+        raise ValueError(f"{int(overlap.sum())} station hours of the batch are already stored "
+                         f"({raw.loc[overlap, 'datetime'].min()} to {raw.loc[overlap, 'datetime'].max()})")
+
+
+def clean_batch(raw, station_type, stats):
+    """Impute and outlier-filter one batch against the running statistics (updates ``stats``)."""
+    stats.update_observed(station_type, raw)
+    df = raw.copy()
+    df[cleaning.NUMERIC_COLUMNS] = df[cleaning.NUMERIC_COLUMNS].fillna(stats.medians(station_type))
+    df["wd"] = df["wd"].fillna(stats.wd_mode(station_type))
+    stats.update_moments(station_type, df)
+
+    z = (df[store.POLLUTANTS].to_numpy() - stats.mean[station_type]) / stats.std(station_type)
+    mask = (np.abs(z) < cleaning.Z_THRESHOLD).all(axis=1)
+    return df.loc[mask, cleaning.CLEAN_COLUMNS].reset_index(drop=True)
+
+
+def append_readings(batch, station_type, store_dir=store.STORE_DIR, config=None):
+    """Append a batch of new hourly rows for one station; returns the rows kept as clean."""
+    stations, _ = ingest.load_config(config or store.DATA_DIR / ingest.CONFIG_FILE)
+    stats = load_stats(store_dir)
+    raw = prepare_batch(batch, station_type)
+    check_batch(raw, station_type, stations, store_dir)
+    cleaned = clean_batch(raw, station_type, stats)
+
+    store.append_dataset(raw, "raw", store_dir)
+    ingest.update_metadata(raw, store_dir)
+    if len(cleaned):
+        store.append_dataset(cleaned, "clean", store_dir)
+        rollups.append(cleaned, store_dir)
+    stats.save(stats_path(store_dir))
+    return cleaned
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new hourly readings to the station store.")
+    parser.add_argument("csv", help="CSV with the same columns as data/urban.csv")
+    parser.add_argument("--station-type", required=True, choices=store.STATION_TYPES)
+    parser.add_argument("--config", help=f"station -> station type JSON (default: data/{ingest.CONFIG_FILE})")
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    parser.add_argument("--warm", action="store_true", help="pre-render the default EDA figures after appending")
+    args = parser.parse_args(argv)
+
+    batch = pd.read_csv(args.csv)
+    cleaned = append_readings(batch, args.station_type, args.store_dir, args.config)
+    print(f"Appended {len(batch)} raw rows, {len(cleaned)} clean rows")
+    for name in ["raw", "clean"]:
+        if len(store.append_files(name, args.store_dir)) >= COMPACT_FILES:
+            print(f"Compacted {store.compact(name, args.store_dir)}")
+    if args.warm:
+        # New rollup version: cached figures of the old one are no longer used. Off by default, so an
+        # append costs what its batch does; the page renders on first request otherwise
+        rendered = renders.warm(args.store_dir)
+        print(f"Pre-rendered {len(rendered)} figures in {sum(r[2] for r in rendered):.1f}s")
+
+
+if __name__ == "__main__":
+    main()
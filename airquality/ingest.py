@@ -0,0 +1,213 @@
+"""Parallel ingest of station CSVs into the ``raw`` dataset.
+
+Every ``*.csv`` in a directory (the shipped files, or the UCI archive's
+``PRSA_Data_<station>_<dates>.csv`` files, several per station as new years
+arrive) is treated as a station file. The station named in each file is
+mapped to its station type by a JSON config (``data/stations.json``)::
+
+    {"exclude": ["df_final.csv"], "stations": {"Guanyuan": "Urban", ...}}
+
+Files are parsed with explicit dtypes and checked against the raw schema in
+a process pool, one file per task, so ingest time falls with the number of
+cores. Each worker writes its rows straight into a staging copy of the
+dataset and returns only the file's metadata (rows, missing cells, time
+span per station), so readings never pass through the parent. Any bad file
+(missing or extra columns, unparseable values, an unknown wind direction or
+station, duplicate hours) or two files covering the same station hours
+fails the whole ingest with its path, and the staging directory is
+discarded; otherwise it replaces the ``raw`` dataset in one rename. The
+metadata is saved beside the dataset, so the Dataset Overview page does not
+re-read the readings.
+
+    python -m airquality.ingest data --config data/stations.json --workers 4
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from airquality import store
+
+CONFIG_FILE = "stations.json"
+META_COLUMNS = ["station", "station_type", "files", "rows", "columns", "missing_cells", "start", "end"]
+
+# Read as text first so unknown wind directions are reported, not silently turned into NaN
+_CSV_DTYPES = {**store.RAW_DTYPES, "wd": "string", "station": "string"}
+
+
+def load_config(path):
+    """``(stations, exclude)``: station name -> station type, and file names to skip."""
+    config = json.loads(Path(path).read_text())
+    stations = config.get("stations", {})
+    unknown = sorted({t for t in stations.values() if t not in store.STATION_TYPES})
+    if unknown:
+        raise ValueError(f"{path}: unknown station types {unknown}; expected {store.STATION_TYPES}")
+    return stations, set(config.get("exclude", []))
+
+
+def discover(data_dir, exclude=()):
+    """Station CSVs directly in ``data_dir``, in name order."""
+    return sorted(p for p in Path(data_dir).glob("*.csv") if p.name not in exclude)
+
+
+# --- Worker: parse and validate one file ---
+def parse_station_csv(path, stations):
+    """One station file in the raw store's schema; raises ``ValueError`` naming the file on any schema problem."""
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    missing = [c for c in store.RAW_COLUMNS if c not in header]
+    extra = [c for c in header if c not in store.RAW_COLUMNS]
+    if missing or extra:
+        raise ValueError(f"{path}: missing columns {missing}, unexpected columns {extra}")
+    try:
+        df = pd.read_csv(path, dtype=_CSV_DTYPES)[store.RAW_COLUMNS]
+    except ValueError as exc:
+        raise ValueError(f"{path}: {exc}") from None
+
+    names = df["station"].dropna().unique()
+    if len(names) != 1 or df["station"].isna().any():
+        raise ValueError(f"{path}: expected one station per file, found {list(names)}")
+    station = str(names[0])
+    if station not in stations:
+        raise ValueError(f"{path}: station {station!r} is not in the station config")
+    bad_wd = df["wd"].notna() & ~df["wd"].isin(store.WIND_DIRECTIONS)
+    if bad_wd.any():
+        raise ValueError(f"{path}: unknown wind directions {sorted(df.loc[bad_wd, 'wd'].unique())}")
+
+    df["wd"] = pd.Categorical(df["wd"], categories=store.WIND_DIRECTIONS)
+    df["station"] = pd.Categorical([station] * len(df))
+    df["station_type"] = pd.Categorical([stations[station]] * len(df), categories=store.STATION_TYPES)
+    try:
+        df["datetime"] = pd.to_datetime(df[["year", "month", "day", "hour"]])
+    except ValueError as exc:
+        raise ValueError(f"{path}: {exc}") from None
+    if df["datetime"].duplicated().any():
+        raise ValueError(f"{path}: {int(df['datetime'].duplicated().sum())} duplicate hours")
+    return df
+
+
+def summarize(df, files=1):
+    """Metadata rows (one per station) of raw readings."""
+    missing = df[store.RAW_COLUMNS].isna().sum(axis=1)
+    grouped = df.assign(missing_cells=missing).groupby("station", observed=True)
+    meta = grouped.agg(
+        station_type=("station_type", "first"),
+        rows=("datetime", "size"),
+        missing_cells=("missing_cells", "sum"),
+        start=("datetime", "min"),
+        end=("datetime", "max"),
+    ).reset_index()
+    meta["station"] = meta["station"].astype(str)
+    meta["station_type"] = meta["station_type"].astype(str)
+    meta["files"] = files
+    meta["columns"] = len(store.RAW_COLUMNS)
+    return meta[META_COLUMNS]
+
+
+def merge_metadata(*metas):
+    """Combine metadata of disjoint row sets (e.g. several files, or history plus a new batch)."""
+    meta = pd.concat(metas, ignore_index=True).groupby("station", as_index=False, sort=False).agg(
+        station_type=("station_type", "first"),
+        files=("files", "sum"),
+        rows=("rows", "sum"),
+        columns=("columns", "first"),
+        missing_cells=("missing_cells", "sum"),
+        start=("start", "min"),
+        end=("end", "max"),
+    )
+    order = meta["station_type"].map(store.STATION_TYPES.index)
+    return meta.assign(order=order).sort_values(["order", "station"], ignore_index=True)[META_COLUMNS]
+
+
+def _ingest_task(task):
+    index, path, stations, staging = task
+    df = parse_station_csv(path, stations)
+    store.write_files(df, staging, f"part-{index:05d}-{{i}}.parquet")
+    return summarize(df).assign(file=str(path))
+
+
+def ingest_all(files, stations, staging, workers=None):
+    """Parse ``files`` concurrently into the ``staging`` dataset directory; returns their metadata in file order."""
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    tasks = [(index, path, stations, staging) for index, path in enumerate(files)]
+    if workers <= 1:
+        return [_ingest_task(task) for task in tasks]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_ingest_task, tasks))
+
+
+def check_extents(summaries):
+    """Raise ``ValueError`` if two files cover overlapping time spans of one station."""
+    spans = pd.concat(summaries, ignore_index=True).sort_values(["station", "start"], ignore_index=True)
+    same = spans["station"].eq(spans["station"].shift())
+    overlap = same & (spans["start"] <= spans["end"].shift())
+    if overlap.any():
+        first = overlap.idxmax()
+        raise ValueError(f"{spans.at[first - 1, 'file']} and {spans.at[first, 'file']} overlap in time "
+                         f"for station {spans.at[first, 'station']!r}")
+
+
+def ingest_directory(data_dir=store.DATA_DIR, store_dir=store.STORE_DIR, config=None, workers=None):
+    """Rewrite the ``raw`` dataset and its station metadata from every station CSV in ``data_dir``.
+
+    Returns the dataset path and the metadata frame.
+    """
+    stations, exclude = load_config(config or Path(data_dir) / CONFIG_FILE)
+    files = discover(data_dir, exclude)
+    if not files:
+        raise ValueError(f"No station CSVs in {data_dir}")
+    staging = store.staging_path("raw", store_dir)
+    try:
+        summaries = ingest_all(files, stations, staging, workers)
+        check_extents(summaries)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    meta = merge_metadata(*[summary.drop(columns="file") for summary in summaries])
+
+    path = store.publish(staging, "raw", store_dir)
+    store.save_station_meta(meta, store_dir)
+    return path, meta
+
+
+def update_metadata(batch, store_dir=store.STORE_DIR):
+    """Fold raw rows just appended to the store into the saved station metadata."""
+    meta = store.load_station_meta(store_dir)
+    if meta is None:
+        # Computed from the raw dataset, which already holds the batch
+        station_metadata(store_dir)
+    else:
+        store.save_station_meta(merge_metadata(meta, summarize(batch, files=0)), store_dir)
+
+
+def station_metadata(store_dir=store.STORE_DIR):
+    """Saved station metadata; computed once from the ``raw`` dataset if it predates this module."""
+    meta = store.load_station_meta(store_dir)
+    if meta is None:
+        raw = store.read_dataset("raw", columns=store.RAW_COLUMNS + ["station_type", "datetime"], store_dir=store_dir)
+        meta = merge_metadata(summarize(raw))
+        store.save_station_meta(meta, store_dir)
+    return meta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest station CSVs into the raw store.")
+    parser.add_argument("data_dir", nargs="?", default=str(store.DATA_DIR))
+    parser.add_argument("--config", help=f"station -> station type JSON (default: <data_dir>/{CONFIG_FILE})")
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    path, meta = ingest_directory(args.data_dir, args.store_dir, args.config, args.workers)
+    print(meta.to_string(index=False))
+    print(f"Wrote {meta['rows'].sum():,} rows of {len(meta)} stations to {path} in {time.perf_counter() - started:.1f}s")
+    print("Run `python -m airquality.cleaning` to rebuild the clean dataset.")
+
+
+if __name__ == "__main__":
+    main()
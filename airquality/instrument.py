@@ -0,0 +1,294 @@
+"""Timers, memory counters and cache hit rates for Streamlit page reruns.
+
+A page calls :func:`start` at the top and :func:`finish` at the bottom.
+Loaders, aggregations, figure builders and model calls are wrapped in
+:func:`section` (a context manager) or :func:`timed` (a decorator), and
+cached loaders are declared with :func:`cached` instead of the bare
+``st.cache_data``/``st.cache_resource`` decorator so hits and misses are
+counted. Each section records its wall time and the change in resident
+memory.
+
+Instrumentation is off unless the page is opened with ``?debug=1`` (which
+also shows a profiling panel in the sidebar) or ``AIRQUALITY_METRICS_FILE``
+is set, in which case every rerun is recorded and the totals are written to
+that file in Prometheus text format after each rerun. When off, a section
+costs one context-variable lookup.
+
+    AIRQUALITY_METRICS_FILE=metrics.prom streamlit run Home.py
+    python -m airquality.instrument serve --file metrics.prom --port 9108
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+METRICS_ENV = "AIRQUALITY_METRICS_FILE"
+DEBUG_PARAM = "debug"
+PREFIX = "airquality"
+
+_run = contextvars.ContextVar("airquality_run", default=None)
+_null = contextlib.nullcontext()
+
+# Process-wide totals across reruns and sessions, keyed by (page, section, kind)
+_lock = threading.Lock()
+_totals = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "rss_max": 0, "hits": 0, "misses": 0})
+_reruns = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def rss():
+    """Resident set size of this process in bytes (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return 0
+
+
+class Run:
+    """Sections recorded during one rerun of one page."""
+
+    def __init__(self, page, debug):
+        self.page = page
+        self.debug = debug
+        self.started = time.perf_counter()
+        self.sections = {}
+        self.cache_stack = []
+
+    def record(self, name, kind, seconds, rss_delta, hit=None):
+        entry = self.sections.get(name)
+        if entry is None:
+            entry = self.sections[name] = {"kind": kind, "calls": 0, "seconds": 0.0, "rss_delta": 0,
+                                           "hits": 0, "misses": 0}
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        entry["rss_delta"] += rss_delta
+        if hit is not None:
+            entry["hits" if hit else "misses"] += 1
+
+
+def enabled():
+    return _run.get() is not None
+
+
+def start(page):
+    """Begin recording this rerun if profiling is requested; returns the run or ``None``."""
+    debug = False
+    try:
+        import streamlit as st
+
+        debug = st.query_params.get(DEBUG_PARAM) == "1"
+    except Exception:
+        pass
+    if not debug and not os.environ.get(METRICS_ENV):
+        _run.set(None)
+        return None
+    run = Run(page, debug)
+    _run.set(run)
+    return run
+
+
+@contextlib.contextmanager
+def _section(run, name, kind, hit_frame=None):
+    before = rss()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        hit = None if hit_frame is None else not hit_frame[0]
+        run.record(name, kind, time.perf_counter() - started, rss() - before, hit)
+
+
+def section(name, kind="section"):
+    """Context manager timing a block as ``name``; a no-op unless this rerun is recorded."""
+    run = _run.get()
+    return _null if run is None else _section(run, name, kind)
+
+
+def timed(name=None, kind="section"):
+    """Decorator form of :func:`section`."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = _run.get()
+            if run is None:
+                return func(*args, **kwargs)
+            with _section(run, label, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def cached(cache, name=None, kind="loader", **options):
+    """Apply a Streamlit cache decorator (with ``options``) and count its hits and misses.
+
+    A miss is detected by the wrapped function body actually running.
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            run = _run.get()
+            if run is not None and run.cache_stack:
+                run.cache_stack[-1][0] = True
+            return func(*args, **kwargs)
+
+        cached_func = cache(**options)(body) if options else cache(body)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = _run.get()
+            if run is None:
+                return cached_func(*args, **kwargs)
+            frame = [False]
+            run.cache_stack.append(frame)
+            try:
+                with _section(run, label, kind, hit_frame=frame):
+                    return cached_func(*args, **kwargs)
+            finally:
+                run.cache_stack.pop()
+
+        wrapper.clear = cached_func.clear
+        return wrapper
+    return decorate
+
+
+def finish():
+    """Close the rerun: add it to the totals, export them and draw the debug panel."""
+    run = _run.get()
+    if run is None:
+        return
+    _run.set(None)
+    elapsed = time.perf_counter() - run.started
+    with _lock:
+        _reruns[run.page]["count"] += 1
+        _reruns[run.page]["seconds"] += elapsed
+        for name, entry in run.sections.items():
+            total = _totals[(run.page, name, entry["kind"])]
+            total["calls"] += entry["calls"]
+            total["seconds"] += entry["seconds"]
+            total["rss_max"] = max(total["rss_max"], entry["rss_delta"])
+            total["hits"] += entry["hits"]
+            total["misses"] += entry["misses"]
+    path = os.environ.get(METRICS_ENV)
+    if path:
+        write_metrics(path)
+    if run.debug:
+        panel(run, elapsed)
+
+
+def _labels(**labels):
+    escaped = {k: str(v).replace("\\", "\\\\").replace('"', '\\"') for k, v in labels.items()}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+
+def prometheus_text():
+    """All totals in the Prometheus text exposition format."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        lines.extend(f"{PREFIX}_{name}{labels} {value}" for labels, value in samples)
+
+    with _lock:
+        totals = {key: dict(value) for key, value in _totals.items()}
+        reruns = {key: dict(value) for key, value in _reruns.items()}
+    metric("reruns_total", "counter", "Recorded page reruns.",
+           [(_labels(page=p), r["count"]) for p, r in reruns.items()])
+    metric("rerun_seconds_total", "counter", "Wall time of recorded page reruns.",
+           [(_labels(page=p), round(r["seconds"], 6)) for p, r in reruns.items()])
+    labelled = [(_labels(page=p, section=s, kind=k), t) for (p, s, k), t in totals.items()]
+    metric("section_calls_total", "counter", "Calls of an instrumented section.",
+           [(l, t["calls"]) for l, t in labelled])
+    metric("section_seconds_total", "counter", "Wall time spent in an instrumented section.",
+           [(l, round(t["seconds"], 6)) for l, t in labelled])
+    metric("section_rss_delta_bytes_max", "gauge", "Largest resident-memory growth during one rerun's calls.",
+           [(l, t["rss_max"]) for l, t in labelled])
+    cache_rows = [(l, t) for l, t in labelled if t["hits"] or t["misses"]]
+    metric("cache_hits_total", "counter", "Streamlit cache hits of a cached loader.",
+           [(l, t["hits"]) for l, t in cache_rows])
+    metric("cache_misses_total", "counter", "Streamlit cache misses of a cached loader.",
+           [(l, t["misses"]) for l, t in cache_rows])
+    metric("process_resident_memory_bytes", "gauge", "Resident memory of the Streamlit process.",
+           [("", rss())])
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path):
+    # Written whole and renamed, so a scraper never reads a partial file
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+    tmp.write_text(prometheus_text())
+    os.replace(tmp, path)
+
+
+def panel(run, elapsed):
+    """Sidebar table of this rerun's sections."""
+    import pandas as pd
+    import streamlit as st
+
+    rows = [{"section": name, **entry} for name, entry in run.sections.items()]
+    table = pd.DataFrame(rows, columns=["section", "kind", "calls", "seconds", "rss_delta", "hits", "misses"])
+    table["ms"] = (table.pop("seconds") * 1000).round(1)
+    table["rss MB"] = (table.pop("rss_delta") / 2**20).round(1)
+    hits, misses = int(table["hits"].sum()), int(table["misses"].sum())
+    with st.sidebar.expander("Profiling", expanded=True):
+        st.caption(f"Rerun {elapsed * 1000:.0f} ms · process RSS {rss() / 2**20:.0f} MB")
+        if hits + misses:
+            st.caption(f"Cache hit rate {hits / (hits + misses):.0%} ({hits} hits, {misses} misses)")
+        st.dataframe(table.sort_values("ms", ascending=False), hide_index=True, use_container_width=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    path_to_file = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        try:
+            body = Path(self.path_to_file).read_bytes()
+        except OSError:
+            body = b""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expose the exported page metrics over HTTP.")
+    parser.add_argument("command", choices=["serve", "show"])
+    parser.add_argument("--file", default=os.environ.get(METRICS_ENV, "metrics.prom"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9108)
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        print(Path(args.file).read_text(), end="")
+        return
+    handler = type("Handler", (_MetricsHandler,), {"path_to_file": args.file})
+    print(f"Serving {args.file} on http://{args.host}:{args.port}/metrics")
+    ThreadingHTTPServer((args.host, args.port), handler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
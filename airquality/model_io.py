@@ -0,0 +1,92 @@
+"""Compact model files and fast loading.
+
+XGBoost models are stored in XGBoost's native UBJSON format and the linear
+model as a small JSON file of coefficients evaluated with plain NumPy, so
+loading a model no longer unpickles scikit-learn/XGBoost estimator objects.
+xgboost itself is imported only when an XGBoost file is actually loaded.
+Legacy ``.pkl`` files are still read when no native file exists.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+XGBOOST_SUFFIX = ".ubj"
+LINEAR_SUFFIX = ".json"
+
+# Flat files in models/, native format first
+MODEL_FILES = {
+    "xgboost": ["xgboost_model.ubj", "xgboost_model.pkl"],
+    "linear": ["linear_regression_model.json", "linear_regression_model.pkl"],
+}
+
+
+class LinearModel:
+    """Pure-NumPy evaluator for a fitted linear regression."""
+
+    def __init__(self, coef, intercept, feature_names=None):
+        self.coef_ = np.asarray(coef, dtype="float64")
+        self.intercept_ = float(intercept)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(self.coef_)
+
+    @classmethod
+    def from_estimator(cls, model):
+        return cls(model.coef_, model.intercept_, getattr(model, "feature_names_in_", None))
+
+    def predict(self, X):
+        return np.asarray(X, dtype="float64") @ self.coef_ + self.intercept_
+
+    def to_dict(self):
+        names = getattr(self, "feature_names_in_", None)
+        return {
+            "coef": self.coef_.tolist(),
+            "intercept": self.intercept_,
+            "feature_names": None if names is None else list(names),
+        }
+
+
+def is_xgboost(model):
+    return hasattr(model, "get_booster")
+
+
+def save_model(model, path_stem):
+    """Write ``model`` natively next to ``path_stem`` (suffix chosen by type); returns the path."""
+    path_stem = Path(path_stem)
+    if is_xgboost(model):
+        path = path_stem.with_suffix(XGBOOST_SUFFIX)
+        tmp = path.with_name(f".{path.stem}.tmp{XGBOOST_SUFFIX}")
+        model.save_model(tmp)
+    else:
+        path = path_stem.with_suffix(LINEAR_SUFFIX)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(LinearModel.from_estimator(model).to_dict()))
+    os.replace(tmp, path)
+    return path
+
+
+def load_model(path):
+    path = Path(path)
+    if path.suffix == XGBOOST_SUFFIX:
+        from xgboost import XGBRegressor
+
+        model = XGBRegressor()
+        model.load_model(path)
+        return model
+    if path.suffix == LINEAR_SUFFIX:
+        spec = json.loads(path.read_text())
+        return LinearModel(spec["coef"], spec["intercept"], spec["feature_names"])
+    import joblib
+
+    return joblib.load(path)
+
+
+def find_model_file(model_type, models_dir):
+    """The first existing flat file for ``model_type`` in ``models_dir``."""
+    for filename in MODEL_FILES[model_type]:
+        path = Path(models_dir) / filename
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"No {model_type} model in {models_dir}; run `python -m airquality.training`")
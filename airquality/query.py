@@ -0,0 +1,216 @@
+"""Filter/aggregate queries over the clean store with embedded DuckDB.
+
+Queries run directly on the Parquet files of the ``clean`` dataset (no
+server, no copy into pandas first), so a page gets back only the aggregated
+rows it charts. Station-type and year filters prune whole partitions; the
+other filters are pushed into the Parquet scan.
+
+    python -m airquality.query PM2.5 --by station --grain hour --period 2015-Q4 --where "WSPM<2"
+"""
+import argparse
+import threading
+
+import duckdb
+import pandas as pd
+
+from airquality import store
+
+DATASET = "clean"
+NUMERIC_COLUMNS = store.POLLUTANTS + store.WEATHER
+GROUP_COLUMNS = ["station", "station_type"]
+
+# Time buckets: truncated timestamps, or cyclic profiles (hour of day, month of year)
+GRAINS = ["hour", "day", "week", "month", "quarter", "year"]
+PROFILES = {"hour_of_day": "hour", "day_of_week": "isodow", "month_of_year": "month"}
+AGGREGATES = {"mean": "avg", "median": "median", "min": "min", "max": "max", "sum": "sum", "count": "count"}
+OPERATORS = ["<=", ">=", "!=", "<", ">", "="]
+
+_connection = None
+_lock = threading.Lock()
+
+
+def _cursor():
+    # One in-memory database per process; each query gets its own cursor so
+    # concurrent Streamlit sessions (threads) do not share a connection
+    global _connection
+    with _lock:
+        if _connection is None:
+            _connection = duckdb.connect()
+        return _connection.cursor()
+
+
+def _quote(column):
+    if column not in NUMERIC_COLUMNS + GROUP_COLUMNS + ["datetime"]:
+        raise ValueError(f"Unknown column {column!r}")
+    return f'"{column}"'
+
+
+def period(label):
+    """(start, end) of a period label such as ``2015``, ``2015-Q4`` or ``2015-11``; end is exclusive."""
+    freq = "Q" if "Q" in label.upper() else "M" if "-" in label else "Y"
+    p = pd.Period(label.upper(), freq=freq)
+    return p.start_time, (p + 1).start_time
+
+
+def parse_condition(text):
+    """``"WSPM<2"`` -> ``("WSPM", "<", 2.0)``."""
+    for op in OPERATORS:
+        column, sep, value = text.partition(op)
+        if sep:
+            return column.strip(), op, float(value)
+    raise ValueError(f"Cannot parse condition {text!r}")
+
+
+def where_clause(start=None, end=None, station_types=None, stations=None, where=None):
+    """SQL predicate and parameters for the common dashboard filters.
+
+    ``start``/``end`` bound ``datetime`` (end exclusive), ``station_types`` and
+    ``stations`` are lists of allowed values, and ``where`` is a list of
+    ``(column, operator, value)`` thresholds on numeric columns.
+    """
+    clauses, params = [], []
+    if start is not None:
+        start = pd.Timestamp(start)
+        clauses += ["datetime >= ?", "year >= ?"]
+        params += [start.to_pydatetime(), start.year]
+    if end is not None:
+        end = pd.Timestamp(end)
+        clauses += ["datetime < ?", "year <= ?"]
+        params += [end.to_pydatetime(), end.year]
+    for column, values in (("station_type", station_types), ("station", stations)):
+        if values is not None:
+            values = [str(v) for v in values]
+            if not values:
+                clauses.append("false")
+                continue
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += values
+    for column, op, value in where or []:
+        if column not in NUMERIC_COLUMNS or op not in OPERATORS:
+            raise ValueError(f"Unsupported condition {column} {op} {value}")
+        clauses.append(f"{_quote(column)} {op} ?")
+        params.append(float(value))
+    return " AND ".join(clauses) or "true", params
+
+
+def _source(store_dir):
+    path = store.dataset_path(DATASET, store_dir) / "**" / "*.parquet"
+    return ("read_parquet(?, hive_partitioning = true, "
+            "hive_types = {'station_type': VARCHAR, 'year': SMALLINT})"), [str(path)]
+
+
+def run(sql, params=(), store_dir=store.STORE_DIR):
+    """Execute ``sql`` in which ``{clean}`` stands for the clean dataset; returns a DataFrame."""
+    source, source_params = _source(store_dir)
+    # The dataset placeholder may only appear once, before any other parameter
+    if sql.count("{clean}") != 1 or "?" in sql.partition("{clean}")[0]:
+        raise ValueError("sql must reference {clean} once, before any parameter")
+    return _cursor().execute(sql.format(clean=source), [*source_params, *params]).df()
+
+
+def _bucket(grain):
+    if grain in PROFILES:
+        return f"date_part('{PROFILES[grain]}', datetime)"
+    if grain in GRAINS:
+        return f"date_trunc('{grain}', datetime)"
+    raise ValueError(f"Unknown grain {grain!r}")
+
+
+def aggregate(columns, by=("station",), grain="hour", how="mean", store_dir=store.STORE_DIR, **filters):
+    """``how`` of ``columns`` per ``by`` group and time bucket, e.g. hourly mean PM2.5 by station.
+
+    ``grain`` is a truncation unit from ``GRAINS``, a profile from
+    ``PROFILES`` or ``None`` for no time bucket; the bucket column is called
+    ``grain``'s name (``datetime`` for truncations). ``filters`` go to
+    :func:`where_clause`.
+    """
+    by = [_quote(c) for c in by]
+    keys = list(by)
+    if grain is not None:
+        keys.append(f"{_bucket(grain)} AS {'datetime' if grain in GRAINS else grain}")
+    func = AGGREGATES[how]
+    values = [f"{func}({_quote(c)}) AS {_quote(c)}" for c in columns]
+    predicate, params = where_clause(**filters)
+    group = ", ".join(str(i + 1) for i in range(len(keys)))
+    sql = (f"SELECT {', '.join(keys + values)} FROM {{clean}} WHERE {predicate}"
+           + (f" GROUP BY {group} ORDER BY {group}" if keys else ""))
+    return run(sql, params, store_dir)
+
+
+def box_stats(columns, by="station_type", store_dir=store.STORE_DIR, **filters):
+    """Quartiles and whisker ends of each of ``columns`` per group, for precomputed box plots.
+
+    Whiskers are the data extremes clipped to 1.5 IQR beyond the quartiles,
+    which needs a single scan; one row per (column, group).
+    """
+    key = _quote(by)
+    parts = []
+    for i, column in enumerate(columns):
+        col = _quote(column)
+        parts.append(f"quantile_cont({col}, [0.25, 0.5, 0.75]) AS q{i}, min({col}) AS lo{i}, max({col}) AS hi{i}")
+    predicate, params = where_clause(**filters)
+    wide = run(f"SELECT {key}, {', '.join(parts)} FROM {{clean}} WHERE {predicate} GROUP BY 1 ORDER BY 1",
+               params, store_dir)
+    rows = []
+    for record in wide.itertuples(index=False):
+        for i, column in enumerate(columns):
+            quartiles, lo, hi = record[1 + 3 * i:4 + 3 * i]
+            if quartiles is None or pd.isna(lo):
+                continue
+            q1, median, q3 = quartiles
+            iqr = q3 - q1
+            rows.append({by: record[0], "column": column, "q1": q1, "median": median, "q3": q3,
+                         "lowerfence": max(lo, q1 - 1.5 * iqr), "upperfence": min(hi, q3 + 1.5 * iqr)})
+    return pd.DataFrame(rows, columns=[by, "column", "q1", "median", "q3", "lowerfence", "upperfence"])
+
+
+def sample(columns, by="station_type", n_per_group=3000, store_dir=store.STORE_DIR, **filters):
+    """Up to ``n_per_group`` rows per group, chosen by a fixed hash so reruns return the same rows."""
+    key = _quote(by)
+    predicate, params = where_clause(**filters)
+    sql = (f"SELECT {', '.join(_quote(c) for c in dict.fromkeys([*columns, by]))} FROM {{clean}} "
+           f"WHERE {predicate} "
+           f"QUALIFY row_number() OVER (PARTITION BY {key} ORDER BY hash(datetime, station)) <= ?")
+    return run(sql, [*params, n_per_group], store_dir)
+
+
+def ols(x, y, by="station_type", store_dir=store.STORE_DIR, **filters):
+    """Least-squares line of ``y`` on ``x`` per group (``slope``, ``intercept``, ``count``)."""
+    key, x, y = _quote(by), _quote(x), _quote(y)
+    predicate, params = where_clause(**filters)
+    sql = (f"SELECT {key}, regr_slope({y}, {x}) AS slope, regr_intercept({y}, {x}) AS intercept, "
+           f"regr_count({y}, {x}) AS count FROM {{clean}} WHERE {predicate} GROUP BY 1 ORDER BY 1")
+    return run(sql, params, store_dir)
+
+
+def extent(store_dir=store.STORE_DIR):
+    """First and last timestamp and the stations (with their type) in the clean store."""
+    stations = run("SELECT DISTINCT station, station_type FROM {clean} ORDER BY 2, 1", store_dir=store_dir)
+    bounds = run("SELECT min(datetime) AS start, max(datetime) AS end FROM {clean}", store_dir=store_dir)
+    return bounds["start"].iat[0], bounds["end"].iat[0], stations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate the clean store with DuckDB.")
+    parser.add_argument("columns", nargs="+")
+    parser.add_argument("--by", nargs="*", default=["station"])
+    parser.add_argument("--grain", default="hour", help=f"one of {GRAINS + list(PROFILES)} or 'none'")
+    parser.add_argument("--how", default="mean", choices=list(AGGREGATES))
+    parser.add_argument("--period", help="e.g. 2015, 2015-Q4, 2015-11")
+    parser.add_argument("--station-type", nargs="*")
+    parser.add_argument("--station", nargs="*")
+    parser.add_argument("--where", action="append", default=[], help='threshold such as "WSPM<2" (repeatable)')
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    args = parser.parse_args(argv)
+
+    start, end = period(args.period) if args.period else (None, None)
+    result = aggregate(
+        args.columns, by=args.by, grain=None if args.grain == "none" else args.grain, how=args.how,
+        store_dir=args.store_dir, start=start, end=end, station_types=args.station_type,
+        stations=args.station, where=[parse_condition(w) for w in args.where],
+    )
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
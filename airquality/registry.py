@@ -0,0 +1,144 @@
+"""Versioned model registry with lazy loading and a memory-bounded LRU.
+
+Artifacts are stored per (station, model_type, version)::
+
+    models/registry/<station>/<model_type>/v<N>/model.ubj|model.json
+    models/registry/<station>/<model_type>/v<N>/metadata.json
+    models/registry/<station>/<model_type>/CURRENT      -> "v<N>"
+
+``station`` is a station name, a station type, or ``"all"`` for the global
+model. Registering a model writes a new version directory and then flips
+``CURRENT``, so a running app picks the new version up on its next lookup
+without a restart. Models are loaded on first use and the least recently
+used ones are dropped once their on-disk size exceeds ``max_bytes``.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+from airquality import features, model_io
+
+REGISTRY_DIR = features.MODELS_DIR / "registry"
+GLOBAL = "all"
+MODEL_STEM = "model"
+METADATA_FILE = "metadata.json"
+CURRENT_FILE = "CURRENT"
+MAX_BYTES = 512 * 1024 * 1024
+
+
+class ModelRegistry:
+    """Loads registered models on demand and keeps the hot ones in memory."""
+
+    def __init__(self, root=REGISTRY_DIR, max_bytes=MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _dir(self, station, model_type):
+        return self.root / station / model_type
+
+    def versions(self, station, model_type):
+        path = self._dir(station, model_type)
+        if not path.is_dir():
+            return []
+        return sorted((p.name for p in path.iterdir() if p.name.startswith("v") and p.is_dir()),
+                      key=lambda name: int(name[1:]))
+
+    def current_version(self, station, model_type):
+        pointer = self._dir(station, model_type) / CURRENT_FILE
+        return pointer.read_text().strip() if pointer.exists() else None
+
+    def has(self, station, model_type):
+        return self.current_version(station, model_type) is not None
+
+    def register(self, station, model_type, model, metadata=None):
+        """Save ``model`` as the next version and make it current; returns the version."""
+        base = self._dir(station, model_type)
+        base.mkdir(parents=True, exist_ok=True)
+        existing = self.versions(station, model_type)
+        version = f"v{int(existing[-1][1:]) + 1 if existing else 1}"
+
+        tmp = base / f".{version}.tmp-{uuid.uuid4().hex[:8]}"
+        tmp.mkdir()
+        path = model_io.save_model(model, tmp / MODEL_STEM)
+        metadata = {
+            "file": path.name,
+            "station": station,
+            "model_type": model_type,
+            "version": version,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "feature_pipeline_version": features.PIPELINE_VERSION,
+            **(metadata or {}),
+        }
+        (tmp / METADATA_FILE).write_text(json.dumps(metadata, indent=2))
+        os.replace(tmp, base / version)
+
+        pointer = base / f".{CURRENT_FILE}.tmp"
+        pointer.write_text(version)
+        os.replace(pointer, base / CURRENT_FILE)
+        return version
+
+    def metadata(self, station, model_type, version=None):
+        version = version or self.current_version(station, model_type)
+        return json.loads((self._dir(station, model_type) / version / METADATA_FILE).read_text())
+
+    def get(self, station, model_type, version=None):
+        """The model for (station, model_type), current version unless ``version`` is given."""
+        if station == GLOBAL and not self.has(station, model_type) and version is None:
+            # Flat files beside the registry (models/) serve as the global model until one is registered
+            path = model_io.find_model_file(model_type, self.root.parent)
+            return self._load(("flat", model_type, path.name), path)
+        version = version or self.current_version(station, model_type)
+        if version is None:
+            raise KeyError(f"No {model_type} model registered for {station!r}")
+        path = self._dir(station, model_type) / version / self.metadata(station, model_type, version)["file"]
+        return self._load((station, model_type, version), path)
+
+    def resolve(self, model_type, station=None, station_type=None):
+        """Most specific model available: the station's, then its type's, then the global one."""
+        for key in (station, station_type):
+            if key and self.has(key, model_type):
+                return self.get(key, model_type)
+        return self.get(GLOBAL, model_type)
+
+    def _load(self, key, path):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key][0]
+            self.misses += 1
+        model = model_io.load_model(path)
+        size = Path(path).stat().st_size
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = (model, size)
+                self._bytes += size
+            self._evict()
+        return model
+
+    def _evict(self):
+        # Keep at least the entry just loaded, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._cache) > 1:
+            _, (_, size) = self._cache.popitem(last=False)
+            self._bytes -= size
+
+    def cached(self):
+        with self._lock:
+            return list(self._cache)
+
+    def prune(self, station, model_type, keep=3):
+        """Delete all but the newest ``keep`` versions (never the current one)."""
+        current = self.current_version(station, model_type)
+        for version in self.versions(station, model_type)[:-keep]:
+            if version != current:
+                shutil.rmtree(self._dir(station, model_type) / version, ignore_errors=True)
@@ -0,0 +1,257 @@
+"""On-disk cache of rendered charts for the static EDA figures.
+
+The matplotlib/seaborn figures of ``2_EDA_Dashboard.py`` (the pollutant
+histogram grid and the correlation heatmap) only change when the rollups
+are rebuilt or the station-type filter changes, so they are rendered once
+per (chart, data version, filter) and the encoded image (PNG or SVG, or
+Plotly JSON for Plotly figures) is kept in ``data/store/renders/``. Images
+are drawn no wider than Streamlit shows them, so ``st.image`` sends the
+file as is instead of resizing it on every rerun. A cache hit is a file
+read: matplotlib is not imported at all. The directory is bounded in size;
+the least recently used renders are evicted first.
+
+``warm`` renders the page's default selection (every station type) and is
+run after ``airquality.cleaning``; other selections are drawn on first
+request. ``--all`` renders every non-empty selection (15 for the four
+types) instead. It also redraws ``actual_vs_predicted.png`` from the test
+predictions saved by training.
+
+    python -m airquality.renders warm [--all]
+    python -m airquality.renders clear
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+import uuid
+from itertools import combinations
+from pathlib import Path
+
+from airquality import features, rollups, store
+
+CACHE_DIR = "renders"
+MAX_BYTES = 64 * 2**20
+# Part of every key: bump when a chart's drawing code changes
+RENDER_VERSION = 2
+# Streamlit's st.pyplot settings, so cached images look the same as live ones
+DPI = 200
+# Widest image st.image shows unscaled (Streamlit's MAXIMUM_CONTENT_WIDTH); wider ones are resized per call
+MAX_WIDTH_PX = 1460
+FORMATS = {"png": "image/png", "svg": "image/svg+xml", "json": "application/json"}
+
+PREDICTIONS_FILE = "test_predictions.parquet"
+PLOT_FILE = "actual_vs_predicted.png"
+
+
+# --- Charts: each takes its filter parameters and returns a matplotlib figure ---
+def _pyplot():
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def pollutant_histograms(station_types, store_dir=store.STORE_DIR):
+    import numpy as np
+
+    plt = _pyplot()
+    histograms = rollups.select(rollups.load(store_dir, rollups.HISTOGRAM_FILE), station_types)
+    fig, axes = plt.subplots(2, 3, figsize=(16, 10))
+    for ax, col in zip(axes.flatten(), store.POLLUTANTS):
+        # Drawn from the precomputed bin counts; the KDE curve is smoothed from the same bins
+        edges, counts, centers, kde = rollups.histogram(histograms, col, bins=40)
+        ax.bar(edges[:-1], counts, width=np.diff(edges), align="edge", color='skyblue', edgecolor="white")
+        ax.plot(centers, kde, color='skyblue')
+        ax.set_title(f'{col} Distribution')
+        ax.set_xlabel(f"{col} Concentration")
+        ax.set_ylabel("Frequency")
+    fig.tight_layout()
+    return fig
+
+
+def correlation_heatmap(station_types, store_dir=store.STORE_DIR):
+    plt = _pyplot()
+    import seaborn as sns
+
+    corr_matrix = rollups.corr(rollups.select(rollups.load(store_dir), station_types), rollups.COLUMNS)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.heatmap(corr_matrix, annot=True, cmap="coolwarm", fmt=".2f", square=True, ax=ax)
+    ax.set_title("Correlation Matrix of Pollutants and Weather Variables")
+    return fig
+
+
+def actual_vs_predicted(predictions):
+    """The notebook's test-set scatter, from a frame of ``Actual`` and one column per model."""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(8, 6))
+    colors = {"Linear Regression": "orange", "XGBoost Regressor": "royalblue"}
+    for model, color in colors.items():
+        if model in predictions:
+            label = "XGBoost" if model == "XGBoost Regressor" else model
+            ax.scatter(predictions["Actual"], predictions[model], alpha=0.6, color=color, label=label)
+    low, high = predictions.min().min(), predictions.max().max()
+    ax.plot([low, high], [low, high], 'r--', label='Ideal Fit')
+    ax.set_xlabel("Actual PM2.5 (µg/m³)")
+    ax.set_ylabel("Predicted PM2.5 (µg/m³)")
+    ax.set_title("Actual vs Predicted PM2.5 (Test Set)")
+    ax.legend()
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
+CHARTS = {
+    "pollutant_histograms": pollutant_histograms,
+    "correlation_heatmap": correlation_heatmap,
+}
+
+
+# --- Encoding ---
+def encode(fig, fmt="png", dpi=DPI):
+    """Bytes of a matplotlib figure (``png``/``svg``) or a Plotly figure (``json``); closes matplotlib figures."""
+    if fmt == "json":
+        return fig.to_json().encode()
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight")
+    _pyplot().close(fig)
+    return buf.getvalue()
+
+
+def write_image(fig, path, fmt="png", dpi=DPI):
+    # Written beside the target and renamed, so the page never shows a half-written image
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp-{uuid.uuid4().hex[:8]}")
+    tmp.write_bytes(encode(fig, fmt, dpi))
+    os.replace(tmp, path)
+    return path
+
+
+# --- Cache ---
+def cache_dir(store_dir=store.STORE_DIR):
+    return Path(store_dir) / CACHE_DIR
+
+
+def data_version(store_dir=store.STORE_DIR):
+    """Version of the rollups the charts are drawn from (their mtime, as on the EDA page)."""
+    return rollups.rollup_path(store_dir).stat().st_mtime_ns
+
+
+def normalize(params):
+    # Filter selections are sets: order and duplicates must not produce new keys
+    out = {}
+    for name, value in params.items():
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(set(value))
+        out[name] = value
+    return out
+
+
+def cache_path(chart, version, params, fmt="png", store_dir=store.STORE_DIR):
+    key = json.dumps([RENDER_VERSION, chart, str(version), fmt, normalize(params)], sort_keys=True, default=str)
+    digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+    return cache_dir(store_dir) / f"{chart}-{digest}.{fmt}"
+
+
+def evict(store_dir=store.STORE_DIR, max_bytes=MAX_BYTES):
+    """Delete least recently used renders until the cache fits in ``max_bytes``; returns the count removed."""
+    entries = []
+    for path in cache_dir(store_dir).glob("*.*"):
+        if path.suffix[1:] not in FORMATS:
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def render(chart, version, fmt="png", store_dir=store.STORE_DIR, max_bytes=MAX_BYTES, **params):
+    """Encoded ``chart`` for ``params`` at data ``version``, from the cache or freshly drawn."""
+    path = cache_path(chart, version, params, fmt, store_dir)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        pass
+    else:
+        # The mtime is the last use, which eviction goes by
+        os.utime(path)
+        return data
+    fig = CHARTS[chart](store_dir=store_dir, **normalize(params))
+    data = encode(fig, fmt, dpi=min(DPI, MAX_WIDTH_PX / fig.get_figwidth()))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp-{uuid.uuid4().hex[:8]}")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    evict(store_dir, max_bytes)
+    return data
+
+
+def selections(station_types=store.STATION_TYPES):
+    """Every non-empty selection of ``station_types``, the page's default (all of them) first."""
+    return [list(chosen) for size in range(len(station_types), 0, -1)
+            for chosen in combinations(station_types, size)]
+
+
+def warm(store_dir=store.STORE_DIR, models_dir=None, plot=PLOT_FILE, max_bytes=MAX_BYTES, every_selection=False):
+    """Render every chart for the default selection, or for all of them; returns ``[(chart, station_types, seconds, cached)]``."""
+    if not rollups.rollup_path(store_dir).exists():
+        rollups.build(store_dir)
+    version = data_version(store_dir)
+    station_types = [t for t in store.STATION_TYPES if t in store.partition_values("clean", "station_type", store_dir)]
+    done = []
+    for selection in selections(station_types) if every_selection else [station_types]:
+        for chart in CHARTS:
+            cached = cache_path(chart, version, {"station_types": selection}, store_dir=store_dir).exists()
+            started = time.perf_counter()
+            render(chart, version, store_dir=store_dir, max_bytes=max_bytes, station_types=selection)
+            done.append((chart, selection, time.perf_counter() - started, cached))
+    if models_dir is not None:
+        write_actual_vs_predicted(models_dir, plot)
+    return done
+
+
+def write_actual_vs_predicted(models_dir, plot=PLOT_FILE):
+    """Redraw ``plot`` from the saved test predictions when they are newer; returns the path or ``None``."""
+    import pandas as pd
+
+    source = Path(models_dir) / PREDICTIONS_FILE
+    plot = Path(plot)
+    if not source.exists() or (plot.exists() and plot.stat().st_mtime_ns >= source.stat().st_mtime_ns):
+        return None
+    return write_image(actual_vs_predicted(pd.read_parquet(source)), plot, dpi=300)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render or clear the cached EDA figures.")
+    parser.add_argument("command", choices=["warm", "clear"])
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    parser.add_argument("--models-dir", default=str(features.MODELS_DIR))
+    parser.add_argument("--plot", default=PLOT_FILE)
+    parser.add_argument("--max-mb", type=float, default=MAX_BYTES / 2**20)
+    parser.add_argument("--all", action="store_true", help="render every station-type selection, not just the default")
+    args = parser.parse_args(argv)
+
+    if args.command == "clear":
+        removed = evict(args.store_dir, max_bytes=0)
+        print(f"Removed {removed} cached renders")
+        return
+    rendered = warm(args.store_dir, args.models_dir, args.plot, int(args.max_mb * 2**20), every_selection=args.all)
+    for chart, selection, seconds, cached in rendered:
+        print(f"{chart:<22} {', '.join(selection):<40} {'cached' if cached else f'{seconds:.2f}s'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Pre-aggregated rollups of the clean dataset.
+
+One row per (station_type, year, month, hour) holding the row count, the sum
+of every pollutant/weather column and the sum of every pairwise product
+(squares included). Means, diurnal/seasonal profiles, the full correlation
+matrix and per-group OLS fits for any station_type subset are derived from
+these few thousand rows instead of the ~140k hourly readings.
+
+Alongside them, fine fixed-bin pollutant histograms per station_type back
+the distribution grid, so no view has to touch the hourly rows.
+"""
+from itertools import combinations_with_replacement
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from airquality import store
+
+ROLLUP_FILE = "rollups.parquet"
+HISTOGRAM_FILE = "histograms.parquet"
+KEYS = ["station_type", "year", "month", "hour"]
+COLUMNS = ["PM2.5", "PM10", "SO2", "NO2", "CO", "O3", "TEMP", "DEWP", "PRES", "WSPM"]
+PAIRS = list(combinations_with_replacement(COLUMNS, 2))
+HIST_COLUMNS = store.POLLUTANTS
+HIST_BINS = 400
+HIST_KEYS = ["station_type", "column", "bin"]
+
+
+def sum_col(col):
+    return f"sum:{col}"
+
+
+def cross_col(a, b):
+    return f"cross:{a}|{b}"
+
+
+def pair_col(a, b):
+    """Cross-product column for two columns given in either order."""
+    return cross_col(a, b) if COLUMNS.index(a) <= COLUMNS.index(b) else cross_col(b, a)
+
+
+def rollup_path(store_dir=store.STORE_DIR, file=ROLLUP_FILE):
+    return Path(store_dir) / file
+
+
+def compute(df):
+    """Rollup rows for a frame with ``datetime``, ``station_type`` and :data:`COLUMNS`."""
+    values = df[COLUMNS].to_numpy(dtype="float64")
+    first, second = zip(*[(COLUMNS.index(a), COLUMNS.index(b)) for a, b in PAIRS])
+    parts = pd.DataFrame(
+        np.hstack([values, values[:, first] * values[:, second]]),
+        columns=[sum_col(c) for c in COLUMNS] + [cross_col(a, b) for a, b in PAIRS],
+        index=df.index,
+    )
+    ts = df["datetime"].dt
+    keys = {
+        "station_type": df["station_type"].astype(str),
+        "year": ts.year.astype("int16"),
+        "month": ts.month.astype("int8"),
+        "hour": ts.hour.astype("int8"),
+    }
+    parts.insert(0, "count", 1)
+    grouped = parts.groupby([keys[k] for k in KEYS]).sum()
+    grouped.index.names = KEYS
+    return grouped.reset_index()
+
+
+def compute_histograms(df):
+    """Counts per (station_type, pollutant, fine bin) over the fixed ``store.COLUMN_RANGES``."""
+    station_types = df["station_type"].astype(str)
+    parts = []
+    for col in HIST_COLUMNS:
+        low, high = store.COLUMN_RANGES[col]
+        scaled = (df[col].to_numpy(dtype="float64") - low) / (high - low) * HIST_BINS
+        bins = np.clip(scaled.astype("int64"), 0, HIST_BINS - 1)
+        counts = pd.Series(1, index=[station_types, bins]).groupby(level=[0, 1]).sum()
+        counts.index.names = ["station_type", "bin"]
+        parts.append(counts.reset_index(name="count").assign(column=col))
+    return pd.concat(parts, ignore_index=True)[HIST_KEYS + ["count"]]
+
+
+def merge(*rollups, keys=KEYS):
+    """Combine rollups of disjoint row sets (e.g. history plus a new batch)."""
+    return pd.concat(rollups, ignore_index=True).groupby(keys, as_index=False).sum()
+
+
+def save(rollups, store_dir=store.STORE_DIR, file=ROLLUP_FILE):
+    path = rollup_path(store_dir, file)
+    tmp = path.with_name(f".{path.name}.tmp")
+    rollups.to_parquet(tmp, index=False)
+    tmp.replace(path)
+    return path
+
+
+def load(store_dir=store.STORE_DIR, file=ROLLUP_FILE):
+    return pd.read_parquet(rollup_path(store_dir, file))
+
+
+def save_all(df, store_dir=store.STORE_DIR):
+    """Write histograms and rollups for ``df``; rollups last, so its mtime marks the version."""
+    save(compute_histograms(df), store_dir, HISTOGRAM_FILE)
+    return save(compute(df), store_dir)
+
+
+def build(store_dir=store.STORE_DIR):
+    """Recompute the rollups and histograms from the whole ``clean`` dataset."""
+    df = store.read_dataset("clean", columns=["datetime", "station_type", *COLUMNS], store_dir=store_dir)
+    return save_all(df, store_dir)
+
+
+def append(batch, store_dir=store.STORE_DIR):
+    """Fold a newly cleaned batch into the saved rollups and histograms."""
+    if not (rollup_path(store_dir).exists() and rollup_path(store_dir, HISTOGRAM_FILE).exists()):
+        # Batch is already in the clean dataset, so a full build covers it
+        return build(store_dir)
+    histograms = merge(load(store_dir, HISTOGRAM_FILE), compute_histograms(batch), keys=HIST_KEYS)
+    save(histograms, store_dir, HISTOGRAM_FILE)
+    return save(merge(load(store_dir), compute(batch)), store_dir)
+
+
+def select(rollups, station_types):
+    return rollups[rollups["station_type"].isin(list(station_types))]
+
+
+def means(rollups, by, columns=COLUMNS):
+    """Mean of ``columns`` grouped by ``by`` (a key name or list of key names)."""
+    grouped = rollups.groupby(by)[["count"] + [sum_col(c) for c in columns]].sum()
+    result = grouped[[sum_col(c) for c in columns]].div(grouped["count"], axis=0)
+    result.columns = list(columns)
+    return result.reset_index()
+
+
+def corr(rollups, columns=COLUMNS):
+    """Pearson correlation matrix from the summed counts, sums and cross-products."""
+    totals = rollups.drop(columns=KEYS).sum()
+    n = totals["count"]
+    mean = np.array([totals[sum_col(c)] for c in columns]) / n
+    cov = np.empty((len(columns), len(columns)))
+    for i, a in enumerate(columns):
+        for j, b in enumerate(columns[i:], start=i):
+            cov[i, j] = cov[j, i] = totals[pair_col(a, b)] / n - mean[i] * mean[j]
+    std = np.sqrt(np.diag(cov))
+    return pd.DataFrame(cov / np.outer(std, std), index=columns, columns=columns)
+
+
+def ols(rollups, x, y, by="station_type"):
+    """Least-squares ``y = intercept + slope * x`` per group, from the summed statistics."""
+    grouped = rollups.groupby(by)[["count", sum_col(x), sum_col(y), pair_col(x, x), pair_col(x, y)]].sum()
+    n = grouped["count"]
+    sxx = grouped[pair_col(x, x)] - grouped[sum_col(x)] ** 2 / n
+    sxy = grouped[pair_col(x, y)] - grouped[sum_col(x)] * grouped[sum_col(y)] / n
+    slope = sxy / sxx
+    intercept = (grouped[sum_col(y)] - slope * grouped[sum_col(x)]) / n
+    return pd.DataFrame({"slope": slope, "intercept": intercept, "count": n}).reset_index()
+
+
+def histogram(histograms, column, bins=40):
+    """Edges and counts for ``column``, regrouped from the fine bins into about ``bins`` bins.
+
+    Only the span that actually holds data is kept, like a histogram drawn
+    straight from the rows. Also returns a Gaussian-smoothed density curve
+    (binned KDE, Scott's bandwidth) scaled to the returned bin counts.
+    """
+    low, high = store.COLUMN_RANGES[column]
+    fine = np.zeros(HIST_BINS)
+    rows = histograms[histograms["column"] == column]
+    np.add.at(fine, rows["bin"].to_numpy(), rows["count"].to_numpy())
+    width = (high - low) / HIST_BINS
+    occupied = np.flatnonzero(fine)
+    if not len(occupied):
+        return np.array([low, high]), np.zeros(1), np.zeros(1), np.zeros(1)
+    first, last = occupied[0], occupied[-1] + 1
+    step = max(int(np.ceil((last - first) / bins)), 1)
+    last = first + int(np.ceil((last - first) / step)) * step
+    fine = np.r_[fine, np.zeros(max(last - HIST_BINS, 0))][first:last]
+
+    counts = fine.reshape(-1, step).sum(axis=1)
+    edges = low + (first + np.arange(len(counts) + 1) * step) * width
+
+    centers = low + (first + np.arange(len(fine)) + 0.5) * width
+    n = fine.sum()
+    mean = (fine * centers).sum() / n
+    std = np.sqrt((fine * (centers - mean) ** 2).sum() / n)
+    bandwidth = max(std * n ** (-1 / 5), width) / width
+    offsets = np.arange(-int(4 * bandwidth) - 1, int(4 * bandwidth) + 2)
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    density = np.convolve(fine, kernel / kernel.sum(), mode="same")
+    return edges, counts, centers, density * step
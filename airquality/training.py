@@ -0,0 +1,276 @@
+"""Time-ordered training and evaluation of the PM2.5 models.
+
+Replaces the notebook's shuffled ``train_test_split`` with rolling-origin
+cross-validation: rows are sorted by time and fold ``k`` trains on every
+block before block ``k`` and tests on block ``k``, so no fold sees the
+future. Folds run in a process pool, one task per fold with every model
+and hyperparameter candidate; the feature matrix is written once to a
+memory-mapped ``.npy`` that all workers share. A task quantizes its fold's
+training rows into one ``QuantileDMatrix`` (one byte per value instead of
+the float matrix) and its test rows into another with the same bins
+(``ref=``), and every XGBoost candidate of the fold trains and predicts on
+those two, so a worker holds one fold at a time and quantizes it once. The
+number of workers is capped so that their folds fit in the available
+memory.
+
+Writes ``model_results.csv`` (mean over folds of the best candidate per
+model), ``models/cv_folds.csv`` (metrics and timings of every fold), the
+best candidates' predictions on the latest fold (``models/test_predictions.parquet``,
+drawn as ``actual_vs_predicted.png``) and the refitted models in native format (``models/xgboost_model.ubj``,
+``models/linear_regression_model.json``), which are also registered as the global models
+in :mod:`airquality.registry`. ``--per-station`` additionally registers an
+XGBoost model per station, trained with the best global parameters.
+
+    python -m airquality.training --folds 5 --workers 4
+"""
+import argparse
+import ast
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from airquality import features, model_io, registry, renders, store
+
+RESULTS_FILE = "model_results.csv"
+FOLDS_FILE = "cv_folds.csv"
+MODEL_FILES = {
+    "Linear Regression": "linear_regression_model",
+    "XGBoost Regressor": "xgboost_model",
+}
+# Registry model_type of each model
+MODEL_TYPES = {
+    "Linear Regression": "linear",
+    "XGBoost Regressor": "xgboost",
+}
+
+# The notebook's settings first, then a few alternatives
+XGB_GRID = {
+    "max_depth": [6, 8],
+    "learning_rate": [0.1],
+    "n_estimators": [100, 300],
+    "subsample": [0.8],
+    "colsample_bytree": [0.8],
+}
+
+
+def xgb_candidates(grid=XGB_GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def rolling_origin_folds(n_rows, n_folds):
+    """(train_end, test_end) row offsets; rows must be sorted by time."""
+    edges = np.linspace(0, n_rows, n_folds + 2).astype(int)
+    return [(int(edges[k]), int(edges[k + 1])) for k in range(1, n_folds + 1)]
+
+
+# Rough resident memory of a worker: the interpreter with XGBoost loaded, then per training value
+# its quantized copy, the gradient buffers and the memory-mapped pages it reads
+WORKER_BASE_BYTES = 200 * 2**20
+WORKER_BYTES_PER_VALUE = 16
+
+
+def available_memory():
+    """Bytes of memory available to new processes (Linux ``MemAvailable``), or ``None`` if unknown."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def memory_workers(workers, n_values, available=None):
+    """``workers`` capped so that many fits on ``n_values`` training values fit in ``available`` bytes."""
+    available = available_memory() if available is None else available
+    if available is None:
+        return workers
+    return max(1, min(workers, available // (WORKER_BASE_BYTES + WORKER_BYTES_PER_VALUE * n_values)))
+
+
+def metrics(y_true, y_pred):
+    return {
+        "R² Score": r2_score(y_true, y_pred),
+        "RMSE": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "MAE": mean_absolute_error(y_true, y_pred),
+    }
+
+
+# --- Worker state: set once per process by the pool initializer ---
+_X = _y = None
+_nthread = 1
+
+
+def _init_worker(x_path, y_path, nthread):
+    global _X, _y, _nthread
+    _X = np.load(x_path, mmap_mode="r")
+    _y = np.load(y_path, mmap_mode="r")
+    _nthread = nthread
+
+
+def _run_fold(task):
+    """Fit and score every ``(model, params)`` candidate of one fold; returns a result per candidate."""
+    fold, (train_end, test_end), candidates = task
+    train = test = None
+    matrix_s = 0.0
+    if any(model_name == "XGBoost Regressor" for model_name, _ in candidates):
+        # Quantized once from the memory-mapped rows and shared by the fold's candidates; the test
+        # rows reuse the training bins. Freed when the task returns
+        started = time.perf_counter()
+        train = xgb.QuantileDMatrix(_X[:train_end], label=_y[:train_end], nthread=_nthread)
+        test = xgb.QuantileDMatrix(_X[train_end:test_end], ref=train, nthread=_nthread)
+        matrix_s = time.perf_counter() - started
+    results = []
+    for model_name, params in candidates:
+        started = time.perf_counter()
+        if model_name == "XGBoost Regressor":
+            booster_params = {k: v for k, v in params.items() if k != "n_estimators"}
+            booster_params.update(objective="reg:squarederror", tree_method="hist", nthread=_nthread, seed=42)
+            booster = xgb.train(booster_params, train, num_boost_round=params["n_estimators"])
+            fit_s = time.perf_counter() - started
+            y_pred = booster.predict(test)
+        else:
+            model = LinearRegression().fit(_X[:train_end], _y[:train_end])
+            fit_s = time.perf_counter() - started
+            y_pred = model.predict(_X[train_end:test_end])
+        results.append({
+            "Model": model_name,
+            "params": repr(params),
+            "fold": fold,
+            "train_rows": train_end,
+            "test_rows": test_end - train_end,
+            **metrics(_y[train_end:test_end], y_pred),
+            "matrix_s": round(matrix_s if model_name == "XGBoost Regressor" else 0.0, 3),
+            "fit_s": round(fit_s, 3),
+            "total_s": round(time.perf_counter() - started, 3),
+            "y_pred": y_pred.astype("float32"),
+        })
+    return results
+
+
+def load_training_data(store_dir=store.STORE_DIR):
+    """Time-sorted clean rows, their model matrix and the fitted (not yet saved) feature pipeline."""
+    columns = [features.TARGET, "datetime"] + features.NUMERIC_FEATURES + [c for c, _ in features.CATEGORICAL_FEATURES]
+    df = store.read_dataset("clean", columns=columns, store_dir=store_dir)
+    df = df.sort_values("datetime", kind="stable", ignore_index=True)
+    pipeline = features.FeaturePipeline.fit(df)
+    return df, pipeline.transform(df), df[features.TARGET].to_numpy(dtype="float64"), pipeline
+
+
+def cross_validate(X, y, n_folds=5, workers=None, grid=XGB_GRID):
+    """Per-fold results for the linear model and every XGBoost candidate.
+
+    Also returns each candidate's predictions on the latest fold, keyed by
+    ``(model, params)``.
+    """
+    folds = rolling_origin_folds(len(y), n_folds)
+    # The last fold trains on the most rows
+    workers = memory_workers(workers or os.cpu_count() or 1, folds[-1][0] * X.shape[1])
+    candidates = [("Linear Regression", {})] + [("XGBoost Regressor", params) for params in xgb_candidates(grid)]
+    # Latest (largest) fold first, so the longest task does not start last
+    tasks = [(k, f, candidates) for k, f in reversed(list(enumerate(folds)))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        x_path, y_path = Path(tmp) / "X.npy", Path(tmp) / "y.npy"
+        np.save(x_path, X.astype("float32"))
+        np.save(y_path, y.astype("float32"))
+        # Split the cores between workers so nested XGBoost threads do not oversubscribe
+        nthread = max((os.cpu_count() or 1) // workers, 1)
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(x_path, y_path, nthread)) as pool:
+            results = [result for fold in pool.map(_run_fold, tasks) for result in fold]
+    predictions = {}
+    for result in results:
+        y_pred = result.pop("y_pred")
+        if result["fold"] == len(folds) - 1:
+            predictions[(result["Model"], result["params"])] = y_pred
+    return pd.DataFrame(results).sort_values("fold", kind="stable", ignore_index=True), predictions
+
+
+def summarize(folds):
+    """Mean fold metrics of the best candidate (lowest mean RMSE) per model."""
+    means = folds.groupby(["Model", "params"], sort=False)[["R² Score", "RMSE", "MAE", "fit_s"]].mean()
+    best = means.loc[means.groupby(level="Model", sort=False)["RMSE"].idxmin()]
+    return best.reset_index()
+
+
+def test_predictions(y, best, predictions, n_folds):
+    """Actual values of the latest fold beside each model's best-candidate predictions."""
+    train_end, test_end = rolling_origin_folds(len(y), n_folds)[-1]
+    frame = pd.DataFrame({"Actual": y[train_end:test_end]})
+    for row in best.itertuples():
+        frame[row.Model] = predictions[(row.Model, row.params)]
+    return frame
+
+
+def make_model(name, params):
+    if name == "XGBoost Regressor":
+        return xgb.XGBRegressor(**params, random_state=42, n_jobs=-1)
+    return LinearRegression()
+
+
+def fit_final(X, y, best, pipeline, models_dir=features.MODELS_DIR, models=None):
+    """Refit each model's best candidate on all rows, save it beside ``pipeline`` and register it globally."""
+    models = models or registry.ModelRegistry(Path(models_dir) / "registry")
+    # Saved with the models it belongs to, so a failed run leaves the previous pair in place
+    pipeline.save(models_dir)
+    X = pd.DataFrame(X, columns=pipeline.feature_names)
+    for row in best.itertuples():
+        model = make_model(row.Model, ast.literal_eval(row.params)).fit(X, y)
+        model_io.save_model(model, Path(models_dir) / MODEL_FILES[row.Model])
+        models.register(registry.GLOBAL, MODEL_TYPES[row.Model], model, {
+            "params": row.params, "rows": len(y), "cv_rmse": row.RMSE, "cv_mae": row.MAE,
+        })
+
+
+def fit_per_station(df, X, y, params, pipeline, models_dir=features.MODELS_DIR, models=None):
+    """Register an XGBoost model per station trained on that station's rows only."""
+    models = models or registry.ModelRegistry(Path(models_dir) / "registry")
+    X = pd.DataFrame(X, columns=pipeline.feature_names)
+    for station, idx in df.groupby("station", observed=True).indices.items():
+        model = make_model("XGBoost Regressor", params).fit(X.iloc[idx], y[idx])
+        models.register(str(station), "xgboost", model, {"params": repr(params), "rows": len(idx)})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validate and retrain the PM2.5 models.")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes (default: all cores; fewer if their folds would not fit in memory)")
+    parser.add_argument("--store-dir", default=str(store.STORE_DIR))
+    parser.add_argument("--models-dir", default=str(features.MODELS_DIR))
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--plot", default=renders.PLOT_FILE, help="actual-vs-predicted scatter of the latest fold")
+    parser.add_argument("--per-station", action="store_true", help="also register one XGBoost model per station")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    df, X, y, pipeline = load_training_data(args.store_dir)
+    folds, predictions = cross_validate(X, y, args.folds, args.workers)
+    Path(args.models_dir).mkdir(parents=True, exist_ok=True)
+    folds.to_csv(Path(args.models_dir) / FOLDS_FILE, index=False)
+    best = summarize(folds)
+    best[["Model", "R² Score", "RMSE", "MAE"]].to_csv(args.results, index=False)
+    test = test_predictions(y, best, predictions, args.folds)
+    test.to_parquet(Path(args.models_dir) / renders.PREDICTIONS_FILE, index=False)
+    renders.write_image(renders.actual_vs_predicted(test), args.plot, dpi=300)
+    fit_final(X, y, best, pipeline, args.models_dir)
+    if args.per_station:
+        xgb_params = best.loc[best["Model"] == "XGBoost Regressor", "params"].iat[0]
+        fit_per_station(df, X, y, ast.literal_eval(xgb_params), pipeline, args.models_dir)
+    print(best.to_string(index=False))
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Time-to-first-render of Home.py and every page, each in a fresh interpreter.
+
+Every script is run through Streamlit's ``AppTest`` in a new process, so the
+numbers include module imports and cache-cold data/model loading, like a
+new worker. Pass ``--baseline`` with an earlier ``--json`` output to fail
+when a script got slower than the allowed tolerance.
+
+    python benchmarks/startup.py --repeat 3 --json startup.json
+    python benchmarks/startup.py --baseline startup.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = ["Home.py", *sorted(str(p.relative_to(ROOT)) for p in (ROOT / "pages").glob("*.py"))]
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=600).run()
+print(json.dumps({
+    "streamlit_import_s": imported - started,
+    "render_s": time.perf_counter() - imported,
+    "exceptions": [str(e.value) for e in at.exception],
+}))
+"""
+
+
+def run_once(script):
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, str(ROOT / script)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started
+    return result
+
+
+def measure(scripts=SCRIPTS, repeat=3):
+    results = {}
+    for script in scripts:
+        runs = [run_once(script) for _ in range(repeat)]
+        results[script] = {
+            "render_s": statistics.median(r["render_s"] for r in runs),
+            "process_s": statistics.median(r["process_s"] for r in runs),
+            "exceptions": runs[-1]["exceptions"],
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Scripts whose median render time grew by more than ``tolerance`` (fraction)."""
+    regressions = []
+    for script, result in results.items():
+        before = baseline.get(script, {}).get("render_s")
+        if before and result["render_s"] > before * (1 + tolerance):
+            regressions.append((script, before, result["render_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure time-to-first-render of the Streamlit scripts.")
+    parser.add_argument("scripts", nargs="*", default=SCRIPTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = measure(args.scripts, args.repeat)
+    for script, result in results.items():
+        status = f"  ({len(result['exceptions'])} exceptions)" if result["exceptions"] else ""
+        print(f"{script:<32} render {result['render_s']:7.3f}s  process {result['process_s']:7.3f}s{status}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for script, before, after in regressions:
+            print(f"REGRESSION {script}: {before:.3f}s -> {after:.3f}s")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Wall time and peak memory of the data, EDA and modelling paths on synthetic data.
+
+For every scale (1x, 10x, 100x the shipped four stations) synthetic CSVs
+are generated once (see ``synthetic.py``) and a fresh interpreter runs each
+step in order: ingesting the CSVs into the store and reading it back, the
+cleaning steps of ``Code.ipynb``, the aggregations, queries and figure
+builds behind ``2_EDA_Dashboard.py``, the AQI and episode replays, and
+XGBoost/linear prediction throughput. Peak memory is the kernel's resident
+high-water mark for the step (reset before each step), so it includes
+Arrow, DuckDB and XGBoost allocations. Everything runs offline.
+
+Results are appended to a JSON history; ``--baseline`` compares against the
+latest entry per scale of another history and fails on regressions.
+
+    python benchmarks/suite.py --scales 1 10 --history bench_history.json
+    python benchmarks/suite.py --scales 1 --baseline bench_history.json --tolerance 0.25
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+SCALES = [1, 10, 100]
+# 100x (14M rows) needs several GB of RAM, so it only runs when asked for
+DEFAULT_SCALES = [1, 10]
+
+
+# --- Peak memory (Linux /proc) ---
+def _status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def reset_peak():
+    # Writing 5 to clear_refs resets VmHWM to the current RSS (Linux >= 4.0)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def measure(func, ctx):
+    reset_peak()
+    before = _status("VmRSS:")
+    started = time.perf_counter()
+    rows = func(ctx)
+    wall = time.perf_counter() - started
+    result = {
+        "wall_s": round(wall, 4),
+        "peak_mb": round(_status("VmHWM:") / 2**20, 1),
+        "peak_delta_mb": round(max(_status("VmHWM:") - before, 0) / 2**20, 1),
+    }
+    if rows:
+        result["rows_per_s"] = round(rows / wall)
+    return result
+
+
+# --- Steps: each takes the shared context and returns a row count for throughput, or None ---
+def ingest_csv(ctx):
+    # Pool workers parse the files and write their own staging Parquet files; the measured peak is the
+    # parent's (per-file summaries, the metadata merge and the rename), not the workers'
+    from airquality import ingest
+
+    _, meta = ingest.ingest_directory(ctx["data_dir"], ctx["store_dir"])
+    return int(meta["rows"].sum())
+
+
+def read_store(ctx):
+    from airquality import store
+
+    ctx["raw"] = store.read_dataset("raw", store_dir=ctx["store_dir"])
+    return len(ctx["raw"])
+
+
+def clean(ctx):
+    from airquality import cleaning
+
+    ctx["clean"] = cleaning.clean(ctx["raw"])
+
+
+def write_clean(ctx):
+    from airquality import store
+
+    store.write_dataset(ctx["clean"], "clean", ctx["store_dir"])
+
+
+def rollups_compute(ctx):
+    from airquality import rollups
+
+    ctx["rollups"] = rollups.compute(ctx["clean"])
+    ctx["histograms"] = rollups.compute_histograms(ctx["clean"])
+
+
+def eda_aggregations(ctx):
+    from airquality import rollups
+
+    numerics = ["PM2.5", "PM10", "SO2", "NO2", "CO", "O3", "TEMP", "DEWP", "PRES", "WSPM"]
+    ctx["corr"] = rollups.corr(ctx["rollups"], numerics)
+    rollups.means(ctx["rollups"], "hour", ["PM2.5"])
+    rollups.means(ctx["rollups"], "month", ["O3"])
+    rollups.ols(ctx["rollups"], "NO2", "O3")
+    for col in ["PM2.5", "PM10", "SO2", "NO2", "CO", "O3"]:
+        rollups.histogram(ctx["histograms"], col, bins=40)
+
+
+def eda_queries(ctx):
+    from airquality import query
+
+    kwargs = dict(store_dir=ctx["store_dir"])
+    ctx["hourly"] = query.aggregate(["PM2.5", "CO", "O3"], by=["station_type"], grain="hour", **kwargs)
+    ctx["boxes"] = query.box_stats(["PM2.5", "CO", "O3"], by="station_type", **kwargs)
+    ctx["sample"] = query.sample(["NO2", "O3"], by="station_type", **kwargs)
+    query.ols("NO2", "O3", by="station_type", **kwargs)
+    query.aggregate(["PM2.5"], by=[], grain="hour_of_day", **kwargs)
+
+
+def downsample_trend(ctx):
+    from airquality import downsample
+
+    # The trend charts: min/max per bucket of the hourly means of each station type
+    ctx["trends"] = {}
+    for pollutant in ["PM2.5", "CO", "O3"]:
+        frame = ctx["hourly"][["datetime", "station_type", pollutant]]
+        ctx["trends"][pollutant] = downsample.downsample_frame(frame, x="datetime", y=pollutant, by="station_type")
+    return len(ctx["hourly"]) * 3
+
+
+def import_plotting(ctx):
+    # Timed on its own so the figure step measures building and rendering only
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import plotly.express  # noqa: F401
+    import seaborn  # noqa: F401
+
+
+def figures(ctx):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import plotly.express as px
+    import seaborn as sns
+    from airquality import rollups
+
+    fig, axes = plt.subplots(2, 3, figsize=(16, 10))
+    for ax, col in zip(axes.flatten(), ["PM2.5", "PM10", "SO2", "NO2", "CO", "O3"]):
+        edges, counts, centers, kde = rollups.histogram(ctx["histograms"], col, bins=40)
+        ax.bar(edges[:-1], counts, width=np.diff(edges), align="edge")
+        ax.plot(centers, kde)
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.heatmap(ctx["corr"], annot=True, cmap="coolwarm", fmt=".2f", square=True, ax=ax)
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+
+    px.line(ctx["trends"]["PM2.5"], x="datetime", y="PM2.5", color="station_type").to_json()
+    px.scatter(ctx["sample"], x="NO2", y="O3", color="station_type").to_json()
+
+
+def aqi_index(ctx):
+    from airquality import aqi
+
+    aqi.monthly(aqi.daily(aqi.hourly(ctx["raw"])))
+
+
+def episodes(ctx):
+    from airquality import episodes
+
+    episodes.episodes(ctx["raw"][["station", "station_type", "datetime", "PM2.5"]])
+    return len(ctx["raw"])
+
+
+def features_transform(ctx):
+    from airquality import features
+
+    ctx["pipeline"] = features.FeaturePipeline.fit(ctx["clean"])
+    ctx["X"] = ctx["pipeline"].transform(ctx["clean"])
+    ctx["y"] = ctx["clean"][features.TARGET].to_numpy(dtype="float64")
+
+
+def train_models(ctx):
+    import numpy as np
+    from sklearn.linear_model import LinearRegression
+    from xgboost import XGBRegressor
+    from airquality import model_io
+
+    # Small fixed-size fits: this step exists to get models to predict with, not to benchmark training
+    rows = np.random.default_rng(0).choice(len(ctx["y"]), size=min(len(ctx["y"]), 50_000), replace=False)
+    ctx["xgboost"] = XGBRegressor(n_estimators=100, max_depth=6, random_state=42).fit(ctx["X"][rows], ctx["y"][rows])
+    ctx["linear"] = model_io.LinearModel.from_estimator(LinearRegression().fit(ctx["X"][rows], ctx["y"][rows]))
+
+
+def predict_xgboost(ctx):
+    ctx["xgboost"].get_booster().inplace_predict(ctx["X"])
+    return len(ctx["X"])
+
+
+def predict_linear(ctx):
+    ctx["linear"].predict(ctx["X"])
+    return len(ctx["X"])
+
+
+STEPS = [
+    ingest_csv, read_store, clean, write_clean, rollups_compute, eda_aggregations,
+    eda_queries, downsample_trend, import_plotting, figures, aqi_index, episodes, features_transform, train_models,
+    predict_xgboost, predict_linear,
+]
+
+
+def run_scale(scale, work_dir, seed=42):
+    """All steps at one scale, in this process."""
+    import synthetic
+
+    data_dir = Path(work_dir) / f"scale-{scale}-s{seed}"
+    synthetic.generate(scale, data_dir, seed)
+    with tempfile.TemporaryDirectory() as store_dir:
+        ctx = {"data_dir": data_dir, "store_dir": Path(store_dir)}
+        results = {}
+        for step in STEPS:
+            results[step.__name__] = measure(step, ctx)
+            print(f"  {step.__name__:<20} {results[step.__name__]['wall_s']:8.3f}s "
+                  f"{results[step.__name__]['peak_delta_mb']:8.1f} MB", file=sys.stderr)
+        results["rows"] = len(ctx["raw"])
+        return results
+
+
+def run_child(scale, work_dir, seed):
+    # A fresh interpreter per scale, so one scale's memory does not inflate the next
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", str(scale), "--work-dir", str(work_dir), "--seed", str(seed)],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(entry, baseline, tolerance):
+    """Steps whose wall time grew by more than ``tolerance`` (fraction) against the same scale in ``baseline``."""
+    regressions = []
+    for scale, steps in entry["scales"].items():
+        previous = next((e["scales"][scale] for e in reversed(baseline) if scale in e["scales"]), None)
+        if previous is None:
+            continue
+        for step, result in steps.items():
+            before = previous.get(step, {}).get("wall_s") if isinstance(result, dict) else None
+            if before and result["wall_s"] > before * (1 + tolerance):
+                regressions.append((scale, step, before, result["wall_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data, EDA and modelling paths on synthetic data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help=f"multiples of the shipped data, e.g. {SCALES}")
+    parser.add_argument("--work-dir", default=None, help="where synthetic CSVs are kept between runs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--history", help="JSON history to append this run to")
+    parser.add_argument("--baseline", help="JSON history to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir or Path(tempfile.gettempdir()) / "airquality-bench")
+    if args.child:
+        print(json.dumps(run_scale(args.child, work_dir, args.seed)))
+        return
+
+    # Read before this run is appended, so a history can serve as its own baseline
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    entry = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(),
+             "cpus": os.cpu_count(), "scales": {}}
+    for scale in args.scales:
+        print(f"scale {scale}x", file=sys.stderr)
+        entry["scales"][str(scale)] = run_child(scale, work_dir, args.seed)
+
+    for scale, steps in entry["scales"].items():
+        print(f"\n{scale}x ({steps['rows']:,} rows)")
+        for step, result in steps.items():
+            if isinstance(result, dict):
+                rate = f"  {result['rows_per_s']:>12,} rows/s" if "rows_per_s" in result else ""
+                print(f"{step:<20} {result['wall_s']:9.3f}s  peak {result['peak_mb']:8.1f} MB{rate}")
+
+    if args.history:
+        path = Path(args.history)
+        history = json.loads(path.read_text()) if path.exists() else []
+        path.write_text(json.dumps(history + [entry], indent=2))
+
+    if baseline is not None:
+        regressions = compare(entry, baseline, args.tolerance)
+        for scale, step, before, after in regressions:
+            print(f"REGRESSION {scale}x {step}: {before:.3f}s -> {after:.3f}s")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
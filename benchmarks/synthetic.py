@@ -0,0 +1,110 @@
+"""Synthetic station CSVs in the schema of ``data/urban.csv``, at a multiple of the shipped volume.
+
+Scale ``k`` writes ``4 * k`` stations, ``k`` per station type. Each station
+is built from its type's real station by drawing whole days from the same
+calendar month of a random year, so the diurnal cycle, the seasonality, the
+cross-pollutant correlation and the missing-value pattern all stay
+realistic. A per-station factor shifts pollutant levels and the weather gets
+a little noise so stations are not copies of one another.
+
+The output directory also gets a ``stations.json`` mapping the synthetic
+stations to their types, so it can be loaded with ``airquality.ingest``.
+
+    python benchmarks/synthetic.py --scale 10 --out /tmp/synthetic
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from airquality import ingest, store  # noqa: E402
+
+WEATHER_NOISE = {"TEMP": 0.5, "PRES": 0.5, "DEWP": 0.5, "WSPM": 0.2}
+
+
+def load_templates(data_dir=ROOT / store.DATA_DIR):
+    """The first real station of each type (by file name), one complete row per hour."""
+    stations, exclude = ingest.load_config(Path(data_dir) / ingest.CONFIG_FILE)
+    templates = {}
+    for path in ingest.discover(data_dir, exclude):
+        df = ingest.parse_station_csv(path, stations)
+        templates.setdefault(df["station_type"].iat[0], df.sort_values("No"))
+    missing = [t for t in store.STATION_TYPES if t not in templates]
+    if missing:
+        raise ValueError(f"No station file in {data_dir} for station types {missing}")
+    return templates
+
+
+def synthesize(template, station, rng):
+    """One synthetic station in the original column order."""
+    n_days = len(template) // 24
+    template = template.iloc[:n_days * 24]
+    months = template["month"].to_numpy()[::24]
+    # Source day for every target day: a random day of the same calendar month
+    source = np.empty(n_days, dtype=np.int64)
+    for month in np.unique(months):
+        pool = np.flatnonzero(months == month)
+        target = np.flatnonzero(months == month)
+        source[target] = rng.choice(pool, size=len(target))
+    rows = (source[:, None] * 24 + np.arange(24)).ravel()
+
+    df = template[store.RAW_COLUMNS].copy()
+    df["station"] = station
+    factor = np.exp(rng.normal(0, 0.15))
+    for col in store.POLLUTANTS:
+        df[col] = np.round(template[col].to_numpy()[rows] * factor, 1)
+    for col in store.WEATHER:
+        values = template[col].to_numpy()[rows]
+        noise = WEATHER_NOISE.get(col)
+        df[col] = np.round(values + rng.normal(0, noise, len(values)), 1) if noise else values
+    df["wd"] = template["wd"].to_numpy()[rows]
+    df["WSPM"] = df["WSPM"].clip(lower=0)
+    return df
+
+
+def generate(scale, out_dir, seed=42, data_dir=ROOT / store.DATA_DIR):
+    """Write ``4 * scale`` station CSVs and their ``stations.json`` to ``out_dir``; returns the CSV paths.
+
+    ``out_dir`` holds one scale and seed, as ingest reads every CSV in it.
+    Files already present are reused.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    templates = load_templates(data_dir)
+    stations = {}
+    files = []
+    for station_type in store.STATION_TYPES:
+        template = templates[station_type]
+        for k in range(scale):
+            station = f"{template['station'].iat[0]}-{k:03d}"
+            path = out_dir / f"{station}.csv"
+            stations[station] = station_type
+            files.append(path)
+            if path.exists():
+                continue
+            rng = np.random.default_rng([seed, store.STATION_TYPES.index(station_type), k])
+            synthesize(template, station, rng).to_csv(path, index=False)
+    (out_dir / ingest.CONFIG_FILE).write_text(json.dumps({"stations": stations}, indent=2))
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic station CSVs.")
+    parser.add_argument("--scale", type=int, default=1, help="multiple of the shipped four-station volume")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    files = generate(args.scale, args.out, args.seed)
+    rows = sum(pd.read_csv(path, usecols=["No"]).shape[0] for path in files)
+    print(f"Wrote {len(files)} stations ({rows:,} rows) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
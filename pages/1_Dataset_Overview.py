@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
 
+from airquality import ingest, instrument, store
+
 # Page setup
 st.set_page_config(page_title="Data Overview", layout="wide")
 st.title("Dataset Overview")
 st.markdown("### Multi-Site Air Quality Data – Beijing")
+instrument.start("Dataset Overview")
 
 # --- Introduction ---
 st.markdown("""
@@ -19,17 +22,26 @@ This app analyzes a curated subset from **four representative stations**, chosen
 """)
 
 # --- Load Datasets ---
-@st.cache_data
-def load_all_sites():
-    urban = pd.read_csv("data/urban.csv")
-    suburban = pd.read_csv("data/sub-urban.csv")
-    rural = pd.read_csv("data/rural.csv")
-    industrial = pd.read_csv("data/industrial.csv")
-    return urban, suburban, rural, industrial
-
-urban_df, suburban_df, rural_df, industrial_df = load_all_sites()
+# One memory-mapped copy shared by all sessions; each site is a zero-copy slice of it
+@instrument.cached(st.cache_resource, max_entries=2)
+def load_all_sites(version):
+    raw = store.load_shared("raw", columns=store.RAW_COLUMNS + ["station_type"])
+    sites = [("Urban", "Guanyuan"), ("Suburban", "Shunyi"), ("Rural", "Huairou"), ("Industrial", "Dongsi")]
+    return tuple(store.station_slice(raw, station_type, station)[store.RAW_COLUMNS]
+                 for station_type, station in sites)
+
+# Rows and missing cells per station, recorded at ingest time
+@instrument.cached(st.cache_data)
+def load_station_meta(version):
+    return ingest.station_metadata()
+
+with instrument.section("ensure_raw_store", kind="loader"):
+    store.ensure_raw_store()
+raw_version = store.dataset_version("raw")
+urban_df, suburban_df, rural_df, industrial_df = load_all_sites(raw_version)
 
 # --- Display Each Site in a Separate Container ---
+@instrument.timed(kind="figure")
 def show_site(title, location_type, description, df, image_url=None):
     with st.container():
         st.markdown(f"#### {title} — *{location_type} Monitoring Station*")
@@ -49,19 +61,18 @@ def show_site(title, location_type, description, df, image_url=None):
 
 # --- Summary table ---
 st.markdown("### Data At a Glance")
-summary = pd.DataFrame({
-    "Station": ["Guanyuan", "Shunyi", "Huairou", "Dongsi"],
-    "Type": ["Urban", "Suburban", "Rural", "Industrial"],
-    "Rows": [len(urban_df), len(suburban_df), len(rural_df), len(industrial_df)],
-    "Columns": [urban_df.shape[1], suburban_df.shape[1], rural_df.shape[1], industrial_df.shape[1]],
-    "% Missing": [
-        urban_df.isnull().mean().mean()*100,
-        suburban_df.isnull().mean().mean()*100,
-        rural_df.isnull().mean().mean()*100,
-        industrial_df.isnull().mean().mean()*100
-    ]
-})
-st.dataframe(summary)
+with instrument.section("summary_table", kind="aggregation"):
+    meta = load_station_meta(raw_version)
+    summary = pd.DataFrame({
+        "Station": meta["station"],
+        "Type": meta["station_type"],
+        "Rows": meta["rows"],
+        "Columns": meta["columns"],
+        "% Missing": meta["missing_cells"] / (meta["rows"] * meta["columns"]) * 100,
+        "From": meta["start"].dt.date,
+        "To": meta["end"].dt.date,
+    })
+st.dataframe(summary, hide_index=True)
 
 
 # --- Urban ---
@@ -125,5 +136,6 @@ These four representative stations form the backbone of the next stages: **Explo
 st.markdown(" ")
 st.markdown("---")
 st.markdown(" ")
+instrument.finish()
 if st.button("Proceed to Exploratory Data Analysis >"):
     st.switch_page("pages/2_EDA_Dashboard.py")
\ No newline at end of file
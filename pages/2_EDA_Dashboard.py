@@ -1,12 +1,14 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import seaborn as sns
-import matplotlib.pyplot as plt
+import numpy as np
+
+# Plotting libraries are imported in the sections that use them, to keep cold start short
+from airquality import aqi, cleaning, downsample, instrument, query, renders, rollups, store
 
 
 # --- Page Title ---
 st.title("Exploratory Data Analysis (EDA)")
+instrument.start("EDA Dashboard")
 
 st.markdown("""
 ### Overview
@@ -17,40 +19,75 @@ All visualisations are followed by concise academic interpretations to support d
 """)
 
 # --- Load Cleaned Dataset ---
-@st.cache_data
-def load_cleaned_data():
-    df = pd.read_csv("data/df_final.csv", parse_dates=["datetime"])
-    df["month"] = df["datetime"].dt.month
-    df["hour"] = df["datetime"].dt.hour
-    return df
-
-df = load_cleaned_data()
+@instrument.cached(st.cache_data)
+def load_station_types():
+    if not store.exists("clean"):
+        cleaning.build_clean_store()
+    return store.partition_values("clean", "station_type")
+
+@instrument.cached(st.cache_data, name="query", max_entries=256)
+def run_query(version, name, *args, **kwargs):
+    # DuckDB aggregates the Parquet store; only the (small) result is cached and charted
+    return getattr(query, name)(*args, **kwargs)
+
+@instrument.cached(st.cache_data)
+def load_aqi_days(version, standard):
+    # Hourly AQI of the raw readings, kept as per-station daily counts
+    return aqi.daily(aqi.hourly(aqi.load_readings(), standard))
+
+@instrument.cached(st.cache_data)
+def load_rollups(version, station_types):
+    return rollups.select(rollups.load(), station_types)
+
+@instrument.timed(kind="loader")
+def rollups_version():
+    # File mtime as cache key, so appended data shows up on the next rerun
+    if not rollups.rollup_path().exists():
+        rollups.build()
+    return rollups.rollup_path().stat().st_mtime_ns
+
+station_types = load_station_types()
 
 # --- Filter by station_type ---
 st.sidebar.header("Filters")
 selected_station_types = st.sidebar.multiselect(
     "Select station types to display:",
-    options=df["station_type"].unique(),
-    default=df["station_type"].unique()
+    options=station_types,
+    default=station_types
+)
+data_version = store.dataset_version("clean")
+first, last, station_list = run_query(data_version, "extent")
+stations = station_list.loc[station_list["station_type"].isin(selected_station_types), "station"].tolist()
+selected_stations = st.sidebar.multiselect("Select stations:", options=stations, default=stations)
+date_range = st.sidebar.date_input(
+    "Date range:",
+    value=(first.date(), last.date()),
+    min_value=first.date(),
+    max_value=last.date(),
 )
-df = df[df["station_type"].isin(selected_station_types)]
+start, end = (date_range if len(date_range) == 2 else (date_range[0], date_range[0]))
+# Filters of every query-backed chart below; the end date is inclusive
+filters = dict(
+    start=pd.Timestamp(start),
+    end=pd.Timestamp(end) + pd.Timedelta(days=1),
+    station_types=selected_station_types,
+    stations=selected_stations,
+)
+# Histograms and correlations come from the rollups, which cover all dates and stations of the selected types;
+# they are drawn once per rollup version and selection and then served from the render cache
+version = rollups_version()
+# The hour/month profiles and OLS fits of that default view come from the rollups too; narrower
+# station or date filters are answered by DuckDB queries on the filtered rows
+unfiltered = selected_stations == stations and (start, end) == (first.date(), last.date())
+ROLLUP_CAPTION = "Covers all dates and stations of the selected station types; the station and date filters do not apply."
 
 # --- Distribution Plots for Major Pollutants ---
 st.subheader("Distribution of Major Pollutants")
-
-pollutants = ['PM2.5', 'PM10', 'SO2', 'NO2', 'CO', 'O3']
-
-fig, axes = plt.subplots(2, 3, figsize=(16, 10))
-axes = axes.flatten()
-
-for i, col in enumerate(pollutants):
-    sns.histplot(df[col], kde=True, bins=40, color='skyblue', ax=axes[i])
-    axes[i].set_title(f'{col} Distribution')
-    axes[i].set_xlabel(f"{col} Concentration")
-    axes[i].set_ylabel("Frequency")
-
-plt.tight_layout()
-st.pyplot(fig)
+with instrument.section("pollutant_histograms", kind="figure"):
+    st.image(renders.render("pollutant_histograms", version, station_types=selected_station_types),
+             use_container_width=True)
+if not unfiltered:
+    st.caption(ROLLUP_CAPTION)
 
 st.markdown("""
 *Interpretation:*  
@@ -61,33 +98,58 @@ Gaseous pollutants like **SO₂** and **CO** show lower baseline concentrations
 
 # --- Time Series Plots for Key Pollutants ---
 st.subheader("Temporal Trends of Key Pollutants")
+with instrument.section("import plotly.express", kind="import"):
+    import plotly.express as px
 
 key_pollutants = ["PM2.5", "CO", "O3"]
 
-for pollutant in key_pollutants:
-    st.markdown(f"**{pollutant} Concentration Over Time**")
-    fig = px.line(df, x="datetime", y=pollutant, color="station_type", template="simple_white")
-    fig.update_layout(height=400, margin=dict(l=20, r=20, t=40, b=20))
-    st.plotly_chart(fig, use_container_width=True)
-
-    st.markdown(f"""
-    *Interpretation:*  
-    The temporal pattern of **{pollutant}** shows variability across station types.  
-    Notably, **PM2.5** exhibits peaks during winter months, potentially due to residential heating and stagnant air conditions.  
-    **O₃** levels tend to rise in summer, influenced by photochemical reactions driven by solar intensity.  
-    **CO** shows consistent urban elevation, likely linked to vehicular emissions.
-    """)
+# Hourly means per station type; narrowing the trend range in the sidebar drills down, and once
+# a series fits the point budget it is drawn at full resolution
+hourly = run_query(data_version, "aggregate", key_pollutants, by=["station_type"], grain="hour", **filters)
+trend_start, trend_end = filters["start"].to_pydatetime(), filters["end"].to_pydatetime()
+trend_range = st.sidebar.slider("Trend range:", min_value=trend_start, max_value=trend_end,
+                                value=(trend_start, trend_end), format="YYYY-MM-DD")
+trend_df = hourly[hourly["datetime"].between(*trend_range)]
+
+with instrument.section("trends", kind="figure"):
+    for pollutant in key_pollutants:
+        st.markdown(f"**{pollutant} Concentration Over Time**")
+        # Min/max per bucket, so pollution peaks survive the reduction
+        series = downsample.downsample_frame(trend_df[["datetime", "station_type", pollutant]],
+                                             x="datetime", y=pollutant, by="station_type")
+        fig = px.line(series, x="datetime", y=pollutant, color="station_type", template="simple_white")
+        fig.update_layout(height=400, margin=dict(l=20, r=20, t=40, b=20))
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f"""
+        *Interpretation:*  
+        The temporal pattern of **{pollutant}** shows variability across station types.  
+        Notably, **PM2.5** exhibits peaks during winter months, potentially due to residential heating and stagnant air conditions.  
+        **O₃** levels tend to rise in summer, influenced by photochemical reactions driven by solar intensity.  
+        **CO** shows consistent urban elevation, likely linked to vehicular emissions.
+        """)
 
 # --- Distributions and Boxplots ---
 st.subheader("Distribution and Variation of Pollutants")
 
-with st.container():
-    cols = st.columns(3)
-    for idx, pollutant in enumerate(key_pollutants):
-        with cols[idx]:
-            fig = px.box(df, x="station_type", y=pollutant, color="station_type",
-                         title=f"{pollutant} Distribution by Station Type", template="simple_white")
-            st.plotly_chart(fig, use_container_width=True)
+with instrument.section("import plotly.graph_objects", kind="import"):
+    import plotly.graph_objects as go
+
+# Quartiles and whiskers are computed in the query; only the box outlines are drawn
+box_df = run_query(data_version, "box_stats", key_pollutants, by="station_type", **filters)
+with instrument.section("box_plots", kind="figure"):
+    with st.container():
+        cols = st.columns(3)
+        for idx, pollutant in enumerate(key_pollutants):
+            with cols[idx]:
+                fig = go.Figure(layout=dict(template="simple_white", title=f"{pollutant} Distribution by Station Type"))
+                for box in box_df[box_df["column"] == pollutant].itertuples():
+                    fig.add_trace(go.Box(
+                        name=box.station_type, x=[box.station_type], q1=[box.q1], median=[box.median], q3=[box.q3],
+                        lowerfence=[box.lowerfence], upperfence=[box.upperfence],
+                    ))
+                fig.update_layout(xaxis_title="station_type", yaxis_title=pollutant, legend_title="station_type")
+                st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("""
 *Interpretation:*  
@@ -98,14 +160,11 @@ Ozone appears more balanced, with **rural zones** occasionally exhibiting elevat
 
 # --- Correlation Heatmap ---
 st.subheader("Correlation Analysis Among Features")
-
-numerics = ["PM2.5", "PM10", "SO2", "NO2", "CO", "O3", "TEMP", "DEWP", "PRES", "WSPM"]
-corr_matrix = df[numerics].corr()
-
-fig, ax = plt.subplots(figsize=(10, 6))
-sns.heatmap(corr_matrix, annot=True, cmap="coolwarm", fmt=".2f", square=True)
-plt.title("Correlation Matrix of Pollutants and Weather Variables")
-st.pyplot(fig)
+with instrument.section("correlation_heatmap", kind="figure"):
+    st.image(renders.render("correlation_heatmap", version, station_types=selected_station_types),
+             use_container_width=True)
+if not unfiltered:
+    st.caption(ROLLUP_CAPTION)
 
 st.markdown("""
 *Interpretation:*  
@@ -117,10 +176,15 @@ Negative correlations between **temperature** and **PM2.5** suggest that colder
 # --- Diurnal Pattern (Hourly) ---
 st.subheader("Diurnal Pattern of PM2.5")
 
-pm_hourly = df.groupby("hour")["PM2.5"].mean().reset_index()
-fig = px.line(pm_hourly, x="hour", y="PM2.5", markers=True, template="simple_white")
-fig.update_layout(title="Average PM2.5 by Hour of Day", height=400)
-st.plotly_chart(fig, use_container_width=True)
+if unfiltered:
+    pm_hourly = rollups.means(load_rollups(version, tuple(selected_station_types)), "hour", ["PM2.5"])
+else:
+    pm_hourly = run_query(data_version, "aggregate", ["PM2.5"], by=[], grain="hour_of_day", **filters)
+    pm_hourly = pm_hourly.rename(columns={"hour_of_day": "hour"})
+with instrument.section("diurnal_pm25", kind="figure"):
+    fig = px.line(pm_hourly, x="hour", y="PM2.5", markers=True, template="simple_white")
+    fig.update_layout(title="Average PM2.5 by Hour of Day", height=400)
+    st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("""
 *Interpretation:*  
@@ -131,10 +195,15 @@ This trend supports the hypothesis that human activity, particularly transportat
 # --- Seasonal Pattern (Monthly) ---
 st.subheader("Monthly Average of O₃")
 
-o3_monthly = df.groupby("month")["O3"].mean().reset_index()
-fig = px.line(o3_monthly, x="month", y="O3", markers=True, template="simple_white")
-fig.update_layout(title="Monthly Average O₃ Levels", height=400)
-st.plotly_chart(fig, use_container_width=True)
+if unfiltered:
+    o3_monthly = rollups.means(load_rollups(version, tuple(selected_station_types)), "month", ["O3"])
+else:
+    o3_monthly = run_query(data_version, "aggregate", ["O3"], by=[], grain="month_of_year", **filters)
+    o3_monthly = o3_monthly.rename(columns={"month_of_year": "month"})
+with instrument.section("monthly_o3", kind="figure"):
+    fig = px.line(o3_monthly, x="month", y="O3", markers=True, template="simple_white")
+    fig.update_layout(title="Monthly Average O₃ Levels", height=400)
+    st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("""
 *Interpretation:*  
@@ -144,18 +213,30 @@ This aligns with increased **sunlight and temperature**, both of which accelerat
 
 # --- Scatter Plot - NO2 vs O3 ---
 st.subheader("Relationship Between NO₂ and O₃")
-
-fig_no2_o3 = px.scatter(
-    df,
-    x="NO2",
-    y="O3",
-    color="station_type",
-    title="NO₂ vs O₃ Relationship by Station Type",
-    opacity=0.6,
-    template="plotly_white",
-    trendline="ols"  # Adds a simple linear trendline for each station type
-)
-st.plotly_chart(fig_no2_o3, use_container_width=True)
+# Markers are a fixed sample per station type; the trendlines are fitted on all filtered rows
+scatter_sample = run_query(data_version, "sample", ["NO2", "O3"], by="station_type", **filters)
+if unfiltered:
+    no2_o3_fits = rollups.ols(load_rollups(version, tuple(selected_station_types)), "NO2", "O3")
+else:
+    no2_o3_fits = run_query(data_version, "ols", "NO2", "O3", by="station_type", **filters)
+with instrument.section("no2_o3_scatter", kind="figure"):
+    fig_no2_o3 = px.scatter(
+        scatter_sample,
+        x="NO2",
+        y="O3",
+        color="station_type",
+        title="NO₂ vs O₃ Relationship by Station Type",
+        opacity=0.6,
+        template="plotly_white",
+    )
+    colors = {trace.name: trace.marker.color for trace in fig_no2_o3.data}
+    no2_range = np.array([scatter_sample["NO2"].min(), scatter_sample["NO2"].max()], dtype="float64")
+    for fit in no2_o3_fits.itertuples():
+        fig_no2_o3.add_trace(go.Scatter(
+            x=no2_range, y=fit.intercept + fit.slope * no2_range, mode="lines",
+            name=f"{fit.station_type} OLS", line=dict(color=colors.get(fit.station_type)),
+        ))
+    st.plotly_chart(fig_no2_o3, use_container_width=True)
 
 st.markdown("""
 *Interpretation:*  
@@ -164,6 +245,52 @@ This is consistent with atmospheric chemistry, where NO₂ participates in photo
 Lower NO₂ levels in rural areas coincide with higher O₃, suggesting regional transport and less NO scavenging in cleaner air masses.
 """)
 
+# --- Air Quality Index Overview ---
+st.subheader("Air Quality Index Overview")
+
+standard = st.radio("AQI standard:", aqi.STANDARDS, horizontal=True,
+                    format_func={"HJ633": "China HJ 633", "EPA": "US EPA"}.get)
+store.ensure_raw_store()
+with instrument.section("aqi_days", kind="loader"):
+    aqi_days = load_aqi_days(store.dataset_version("raw"), standard)
+aqi_days = aqi_days[
+    aqi_days["station"].isin(selected_stations)
+    & aqi_days["date"].between(filters["start"], filters["end"], inclusive="left")
+]
+categories = aqi.CATEGORIES[standard]
+
+with instrument.section("aqi_overview", kind="figure"):
+    if len(aqi_days):
+        cols = st.columns(3)
+        cols[0].metric("Mean AQI", f"{aqi_days['aqi_mean'].mean():.0f}")
+        # Days of the range can all lack a valid AQI (e.g. gaps in the readings), leaving no hours to divide by
+        hours = aqi_days[categories].sum().sum()
+        cols[1].metric(f"Hours with AQI > {aqi.THRESHOLD}", f"{aqi_days['hours_over'].sum() / hours:.0%}" if hours else "n/a")
+        cols[2].metric(f"Days with mean AQI > {aqi.THRESHOLD}", int(aqi_days["day_over"].sum()))
+
+        # Share of hours in each AQI category, per station
+        shares = aqi_days.groupby("station", observed=True)[categories].sum()
+        shares = shares.div(shares.sum(axis=1), axis=0).reset_index().melt(
+            id_vars="station", var_name="category", value_name="share of hours")
+        fig = px.bar(shares, x="station", y="share of hours", color="category", template="simple_white",
+                     category_orders={"category": categories}, color_discrete_sequence=px.colors.sequential.YlOrRd,
+                     title="Hours per AQI Category")
+        fig.update_layout(yaxis_tickformat=".0%", height=400)
+        st.plotly_chart(fig, use_container_width=True)
+
+        months = aqi.monthly(aqi_days)
+        fig = px.line(months, x="month", y="exceedance_days", color="station", markers=True, template="simple_white",
+                      title=f"Days per Month with Mean AQI above {aqi.THRESHOLD}")
+        fig.update_layout(height=400)
+        st.plotly_chart(fig, use_container_width=True)
+
+st.markdown("""
+*Interpretation:*  
+The AQI is computed from the **raw** readings (rolling 24-hour means for particles, 1- and 8-hour values for the gases), so
+pollution episodes removed as outliers in the cleaned data are counted here. Exceedances cluster in the **heating season**,
+and **PM2.5** is the primary pollutant on most polluted days, while **O₃** is the primary pollutant on many summer afternoons.
+""")
+
 
 # --- Final Summary & Navigation ---
 st.markdown("---")
@@ -179,5 +306,6 @@ These insights will inform the next stage of the project: **predictive modelling
 
 """)
 
+instrument.finish()
 if st.button("Proceed to Predictive Modelling >"):
     st.switch_page("pages/3_Model_prediction.py")  
@@ -1,27 +1,58 @@
 import streamlit as st
 import pandas as pd
-import joblib
-import plotly.graph_objects as go
-import plotly.express as px
-import numpy as np
-from datetime import datetime, timedelta
+
+# Plotting libraries are imported in the sections that use them, to keep cold start short
+from airquality import features, forecast, instrument, registry, store
 
 st.set_page_config(page_title="Model Predictions", layout="wide")
 
 st.title(" Model Predictions & Comparison")
+instrument.start("Model Predictions")
 
 # --- Loading saved models and results ---
-@st.cache_resource
-def load_model(path):
-    return joblib.load(path)
-
-@st.cache_data
+@instrument.cached(st.cache_resource)
+def get_registry():
+    # One registry per server process; models load on first use and hot-swap on new versions
+    return registry.ModelRegistry()
+
+@instrument.timed(kind="model")
+def load_model(model_type, station=None, station_type=None):
+    model = get_registry().resolve(model_type, station, station_type)
+    # Feature layout fitted with the models; refuses to score if they disagree
+    pipeline.check(model)
+    return model
+
+@instrument.cached(st.cache_data)
 def load_results():
     return pd.read_csv("model_results.csv")  
 
-# Load models 
-xgb_model = load_model("models/xgboost_model.pkl")
-lr_model = load_model("models/linear_regression_model.pkl")
+@instrument.cached(st.cache_resource)
+def load_pipeline():
+    return features.FeaturePipeline.load()
+
+@instrument.cached(st.cache_data)
+def load_recent_readings(days=30):
+    # Daily mean readings per station over the last `days` days of the clean dataset
+    columns = features.NUMERIC_FEATURES + ["PM2.5", "datetime", "station", "station_type", "wd"]
+    df = store.read_dataset("clean", columns=columns)
+    df = df[df["datetime"] > df["datetime"].max() - pd.Timedelta(days=days)]
+    daily = df.groupby(["station", "station_type", df["datetime"].dt.floor("D")], observed=True)
+    means = daily[features.NUMERIC_FEATURES + ["PM2.5"]].mean()
+    means["wd"] = daily["wd"].agg(lambda s: s.mode().iat[0]).astype(str)
+    return means.reset_index()
+
+# Keyed on the saved forecaster's mtime, so retraining takes effect without a restart
+@instrument.cached(st.cache_resource, max_entries=2)
+def load_forecaster(version):
+    return forecast.Forecaster.load()
+
+@instrument.cached(st.cache_data, max_entries=2)
+def load_forecasts(version):
+    # All stations at the maximum horizon in one recursive pass; the slider only slices it
+    return load_forecaster(version).forecast_all(forecast.MAX_HORIZON)
+
+pipeline = load_pipeline()
+recent = load_recent_readings()
 
 # Load results table
 results_df = load_results()
@@ -63,48 +94,95 @@ This visual evidence supports the selection of **XGBoost** as the primary model
 
 # --- Feature Importance Plot ---
 st.subheader("Top 20 Feature Importances (XGBoost)")
+with instrument.section("import plotly.express", kind="import"):
+    import plotly.express as px
 
+xgb_model = load_model("xgboost")
 feature_importance = pd.DataFrame({
     "Feature": xgb_model.feature_names_in_,
     "Importance": xgb_model.feature_importances_
 }).sort_values(by="Importance", ascending=False).head(20)
 
-fig_fi = px.bar(
-    feature_importance,
-    x="Importance",
-    y="Feature",
-    orientation='h',
-    title="Top 20 Feature Importances",
-    labels={"Importance": "Feature Importance (Gain)", "Feature": "Feature Name"},
-    template="plotly_white"
-)
-fig_fi.update_layout(yaxis=dict(autorange="reversed"))  # Highest at top
-st.plotly_chart(fig_fi, use_container_width=True)
+with instrument.section("feature_importance", kind="figure"):
+    fig_fi = px.bar(
+        feature_importance,
+        x="Importance",
+        y="Feature",
+        orientation='h',
+        title="Top 20 Feature Importances",
+        labels={"Importance": "Feature Importance (Gain)", "Feature": "Feature Name"},
+        template="plotly_white"
+    )
+    fig_fi.update_layout(yaxis=dict(autorange="reversed"))  # Highest at top
+    st.plotly_chart(fig_fi, use_container_width=True)
+
+# --- Score a Station Reading ---
+st.subheader(" Score a Station Reading")
+
+stations = sorted(recent["station"].astype(str).unique())
+with st.form("score_reading"):
+    station = st.selectbox("Station", stations)
+    latest = recent[recent["station"] == station].iloc[-1]
+    input_cols = st.columns(4)
+    # The month of the station's latest readings, as the models take the calendar month
+    reading = {"station": [station], "station_type": [str(latest["station_type"])],
+               "month": [latest["datetime"].month]}
+    for i, col in enumerate(features.NUMERIC_FEATURES):
+        with input_cols[i % 4]:
+            reading[col] = [st.number_input(col, value=float(round(latest[col], 1)))]
+    reading["wd"] = [st.selectbox("Wind direction", pipeline.vocabularies["wd"],
+                                  index=pipeline.vocabularies["wd"].index(latest["wd"]))]
+    submitted = st.form_submit_button("Predict PM2.5")
+
+if submitted:
+    with instrument.section("transform_reading", kind="model"):
+        X_reading = pipeline.transform(reading)
+    # Station-specific models are used where registered, else the global ones
+    station_xgb = load_model("xgboost", station, reading["station_type"][0])
+    station_lr = load_model("linear", station, reading["station_type"][0])
+    with instrument.section("predict_reading", kind="model"):
+        score_cols = st.columns(2)
+        score_cols[0].metric("XGBoost", f"{station_xgb.predict(X_reading)[0]:.1f} µg/m³")
+        score_cols[1].metric("Linear Regression", f"{station_lr.predict(X_reading)[0]:.1f} µg/m³")
 
 # --- Real-time Forecast with XGBoost ---
 st.subheader(" Forecast Plot (XGBoost)")
+with instrument.section("import plotly.graph_objects", kind="import"):
+    import plotly.graph_objects as go
 
-# --- Generate future timestamps---
-future_days = st.slider("Select forecast horizon (days)", 5, 30, 10)
-future_dates = pd.date_range(datetime.now(), datetime.now() + timedelta(days=future_days), freq='D')
+forecast_version = forecast.version()
+forecaster = load_forecaster(forecast_version)
+forecast_station = st.selectbox("Forecast station", forecaster.stations)
+future_days = st.slider("Select forecast horizon (days)", 1, forecast.MAX_HORIZON, 10)
 
-X_future = np.random.rand(len(future_dates), xgb_model.n_features_in_)
-forecast = xgb_model.predict(X_future)
+# --- Recursive daily forecast from the cached lag window ---
+with instrument.section("forecast_slice", kind="model"):
+    predicted = load_forecasts(forecast_version).loc[forecast_station].iloc[:future_days]
+    history = forecaster.history(forecast_station)
 
 # --- Interactive forecast chart ---
-fig = go.Figure()
-fig.add_trace(go.Scatter(
-    x=future_dates, y=forecast,
-    mode='lines+markers',
-    name='XGBoost Forecast',
-    line=dict(color='royalblue', width=2)
-))
-
-fig.update_layout(
-    title="XGBoost Real-Time Forecast",
-    xaxis_title="Date",
-    yaxis_title="Predicted Value",
-    template="plotly_white"
-)
-
-st.plotly_chart(fig, use_container_width=True)
+with instrument.section("forecast_chart", kind="figure"):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=history["date"], y=history["PM2.5"],
+        mode='lines',
+        name='Observed (daily mean)',
+        line=dict(color='gray', width=2)
+    ))
+    fig.add_trace(go.Scatter(
+        x=predicted.index, y=predicted.to_numpy(),
+        mode='lines+markers',
+        name='XGBoost Forecast',
+        line=dict(color='royalblue', width=2)
+    ))
+
+    fig.update_layout(
+        title=f"XGBoost {future_days}-Day PM2.5 Forecast – {forecast_station}",
+        xaxis_title="Date",
+        yaxis_title="Daily Mean PM2.5 (µg/m³)",
+        template="plotly_white"
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
+
+instrument.finish()
@@ -0,0 +1,29 @@
+"""Shared fixtures: small station files cut from the shipped CSVs."""
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from airquality import ingest, store  # noqa: E402
+
+STATIONS = {"Guanyuan": "Urban", "Huairou": "Rural"}
+
+
+@pytest.fixture(scope="session")
+def urban_csv():
+    """The first 40 days of the shipped urban station, as read from its CSV."""
+    return pd.read_csv(ROOT / store.DATA_DIR / "urban.csv", nrows=24 * 40)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """An empty data directory whose station config maps the shipped urban and rural stations."""
+    path = tmp_path / "data"
+    path.mkdir()
+    (path / ingest.CONFIG_FILE).write_text(json.dumps({"stations": STATIONS}))
+    return path
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from airquality import aqi
+
+
+@pytest.mark.parametrize("conc, expected", [
+    (0, 0), (35, 50), (75, 100), (55, 75), (500, 500),
+    # Above the table the top index applies; below it or missing there is none
+    (600, 500), (-1, np.nan), (np.nan, np.nan),
+])
+def test_hj633_pm25_breakpoints(conc, expected):
+    np.testing.assert_allclose(aqi.HJ633[("PM2.5", 24)]([conc]), [expected])
+
+
+def test_hj633_hourly_so2_has_no_index_above_its_table():
+    np.testing.assert_allclose(aqi.HJ633[("SO2", 1)]([800, 800.1]), [200, np.nan])
+
+
+@pytest.mark.parametrize("conc, expected", [
+    (9.0, 50), (9.1, 51), (35.4, 100), (325.4, 500), (400, 500),
+    # Truncated to one decimal before the lookup, so values in the printed gaps take the lower segment
+    (9.05, 50), (35.45, 100),
+])
+def test_epa_pm25_breakpoints(conc, expected):
+    np.testing.assert_allclose(aqi.EPA[("PM2.5", 24)]([conc]), [expected])
+
+
+def test_epa_tables_that_hand_over_to_another_period():
+    # 1 h ozone starts at 0.125 ppm; below it only the 8 h table applies
+    np.testing.assert_allclose(aqi.EPA[("O3", 1)]([0.124, 0.125, 0.604, 0.7]), [np.nan, 101, 500, 500])
+    # 8 h ozone ends at 0.200 ppm, where the 1 h table takes over
+    np.testing.assert_allclose(aqi.EPA[("O3", 8)]([0.2, 0.201]), [300, np.nan])
+    np.testing.assert_allclose(aqi.EPA[("SO2", 24)]([304, 305, 1004, 2000]), [np.nan, 201, 500, 500])
+
+
+def test_categories_at_bounds():
+    categories = aqi.categorize([0, 50, 50.2, 100, 101, 300, 301, np.nan])
+    assert list(categories.astype(object)) == [
+        "Excellent", "Excellent", "Good", "Good", "Lightly polluted", "Heavily polluted", "Severely polluted", np.nan,
+    ]
+
+
+def test_hourly_takes_the_highest_sub_index():
+    readings = pd.DataFrame({
+        "station": ["A"] * 24,
+        "datetime": pd.date_range("2016-01-01", periods=24, freq="h"),
+        "PM2.5": [75.0] * 24,
+        "PM10": [50.0] * 24,
+        "SO2": [10.0] * 24,
+        "NO2": [40.0] * 24,
+        "CO": [1000.0] * 24,
+        "O3": [300.0] * 24,
+    })
+    out = aqi.hourly(readings)
+    # 300 µg/m³ of O3 reads 150 on the 1 h table; from the 6th valid hour the 8 h table's 206.5 is higher
+    assert out["AQI"].iat[4] == 150 and out["primary"].iat[4] == "O3"
+    assert out["AQI"].iat[-1] == pytest.approx(200 + 35 / 535 * 100)
+    # 24 h particles need 20 valid hours: before that only the gases have an index
+    assert np.isnan(out["IAQI PM2.5"].iat[18]) and out["IAQI PM2.5"].iat[19] == 100
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from airquality import cleaning, incremental, ingest, rollups, store
+
+HISTORY_ROWS = 24 * 30
+
+
+def read_raw(store_dir):
+    df = store.read_dataset("raw", store_dir=store_dir)
+    df["station"] = df["station"].astype(str)
+    return df.sort_values(["station", "datetime"], ignore_index=True)
+
+
+@pytest.fixture
+def appended(tmp_path, data_dir, urban_csv):
+    """A store built from the first 30 days, then the last 10 appended; returns (store_dir, batch)."""
+    urban_csv.iloc[:HISTORY_ROWS].to_csv(data_dir / "urban.csv", index=False)
+    store_dir = tmp_path / "store"
+    ingest.ingest_directory(data_dir, store_dir, workers=1)
+    cleaning.build_clean_store(store_dir, data_dir)
+    batch = urban_csv.iloc[HISTORY_ROWS:]
+    incremental.append_readings(batch, "Urban", store_dir, config=data_dir / ingest.CONFIG_FILE)
+    return store_dir, batch
+
+
+def test_running_stats_merge_matches_full_fit(urban_csv):
+    raw = incremental.prepare_batch(urban_csv, "Urban").dropna().reset_index(drop=True)
+    history, batch = raw.iloc[:HISTORY_ROWS], raw.iloc[HISTORY_ROWS:]
+
+    merged = incremental.fit_stats(history)
+    merged.update_observed("Urban", batch)
+    merged.update_moments("Urban", batch)
+    full = incremental.fit_stats(raw)
+
+    np.testing.assert_array_equal(merged.hist["Urban"], full.hist["Urban"])
+    np.testing.assert_array_equal(merged.wd_counts["Urban"], full.wd_counts["Urban"])
+    assert merged.count["Urban"] == full.count["Urban"] == len(raw)
+    np.testing.assert_allclose(merged.mean["Urban"], full.mean["Urban"])
+    np.testing.assert_allclose(merged.m2["Urban"], full.m2["Urban"])
+
+
+def test_running_stats_round_trip(tmp_path, urban_csv):
+    stats = incremental.fit_stats(incremental.prepare_batch(urban_csv, "Urban"))
+    stats.save(tmp_path / "stats.npz")
+    loaded = incremental.RunningStats.load(tmp_path / "stats.npz")
+    pd.testing.assert_series_equal(loaded.medians("Urban"), stats.medians("Urban"))
+    assert loaded.wd_mode("Urban") == stats.wd_mode("Urban")
+
+
+def test_append_matches_full_rebuild(tmp_path, data_dir, urban_csv, appended):
+    store_dir, _ = appended
+    full_dir = tmp_path / "full"
+    full_dir.mkdir()
+    (full_dir / ingest.CONFIG_FILE).write_text((data_dir / ingest.CONFIG_FILE).read_text())
+    urban_csv.to_csv(full_dir / "urban.csv", index=False)
+    ingest.ingest_directory(full_dir, tmp_path / "full-store", workers=1)
+
+    appended_raw, full_raw = read_raw(store_dir), read_raw(tmp_path / "full-store")
+    pd.testing.assert_frame_equal(appended_raw[full_raw.columns], full_raw)
+    pd.testing.assert_frame_equal(store.load_station_meta(store_dir), store.load_station_meta(tmp_path / "full-store"))
+    # The rollups count every clean row once, history and batch alike
+    clean_rows = len(store.read_dataset("clean", columns=["datetime"], store_dir=store_dir))
+    assert rollups.load(store_dir)["count"].sum() == clean_rows
+
+
+def test_append_rejects_repeated_batch(data_dir, appended):
+    store_dir, batch = appended
+    rows, meta = len(read_raw(store_dir)), store.load_station_meta(store_dir)
+    with pytest.raises(ValueError, match="already stored"):
+        incremental.append_readings(batch, "Urban", store_dir, config=data_dir / ingest.CONFIG_FILE)
+    with pytest.raises(ValueError, match="repeats"):
+        incremental.append_readings(pd.concat([batch, batch]), "Urban", store_dir,
+                                    config=data_dir / ingest.CONFIG_FILE)
+    assert len(read_raw(store_dir)) == rows
+    pd.testing.assert_frame_equal(store.load_station_meta(store_dir), meta)
+
+
+def test_append_rejects_station_of_another_type(data_dir, appended, urban_csv):
+    store_dir, _ = appended
+    batch = urban_csv.iloc[:24].assign(year=2020)
+    with pytest.raises(ValueError, match="not of station type 'Rural'"):
+        incremental.append_readings(batch, "Rural", store_dir, config=data_dir / ingest.CONFIG_FILE)
+    with pytest.raises(ValueError, match="not in the station config"):
+        incremental.append_readings(batch.assign(station="Nowhere"), "Urban", store_dir,
+                                    config=data_dir / ingest.CONFIG_FILE)
+
+
+def test_compact_keeps_rows(appended):
+    store_dir, _ = appended
+    before = read_raw(store_dir)
+    assert store.append_files("raw", store_dir)
+    store.compact("raw", store_dir)
+    assert not store.append_files("raw", store_dir)
+    pd.testing.assert_frame_equal(read_raw(store_dir), before)
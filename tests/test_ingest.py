@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from airquality import ingest, store
+
+from conftest import STATIONS
+
+
+def write(data_dir, df, name="station.csv"):
+    path = data_dir / name
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_parse_station_csv(data_dir, urban_csv):
+    df = ingest.parse_station_csv(write(data_dir, urban_csv), STATIONS)
+    assert len(df) == len(urban_csv)
+    assert set(df["station_type"]) == {"Urban"}
+    assert df["datetime"].is_monotonic_increasing
+    assert str(df["wd"].dtype) == "category" and list(df["wd"].cat.categories) == store.WIND_DIRECTIONS
+
+
+@pytest.mark.parametrize("corrupt, message", [
+    (lambda df: df.drop(columns="PM2.5"), r"missing columns \['PM2.5'\]"),
+    (lambda df: df.assign(extra=1), r"unexpected columns \['extra'\]"),
+    (lambda df: df.assign(station="Nowhere"), "not in the station config"),
+    (lambda df: df.assign(station=["Guanyuan", "Huairou"] * (len(df) // 2)), "expected one station per file"),
+    (lambda df: df.assign(wd=df["wd"].where(df.index != 3, "XX")), r"unknown wind directions \['XX'\]"),
+    (lambda df: df.assign(SO2=df["SO2"].astype(object).where(df.index != 5, "high")), "station.csv"),
+    (lambda df: df.assign(month=df["month"].where(df.index != 7, 13)), "station.csv"),
+    (lambda df: pd.concat([df, df.iloc[:2]]), "2 duplicate hours"),
+])
+def test_parse_station_csv_rejects_bad_files(data_dir, urban_csv, corrupt, message):
+    path = write(data_dir, corrupt(urban_csv.copy()))
+    with pytest.raises(ValueError, match=message):
+        ingest.parse_station_csv(path, STATIONS)
+
+
+def test_ingest_directory_writes_dataset_and_metadata(tmp_path, data_dir, urban_csv):
+    # Two files of one station, as the UCI archive ships new years
+    write(data_dir, urban_csv.iloc[:500], "a.csv")
+    write(data_dir, urban_csv.iloc[500:], "b.csv")
+    path, meta = ingest.ingest_directory(data_dir, tmp_path / "store", workers=2)
+    assert len(store.read_dataset("raw", store_dir=tmp_path / "store")) == len(urban_csv)
+    assert meta[["station", "files", "rows"]].values.tolist() == [["Guanyuan", 2, len(urban_csv)]]
+    pd.testing.assert_frame_equal(store.load_station_meta(tmp_path / "store"), meta)
+
+
+def test_ingest_directory_rejects_overlapping_files(tmp_path, data_dir, urban_csv):
+    write(data_dir, urban_csv.iloc[:500], "a.csv")
+    ingest.ingest_directory(data_dir, tmp_path / "store", workers=1)
+    write(data_dir, urban_csv.iloc[400:], "b.csv")
+    with pytest.raises(ValueError, match="overlap in time for station 'Guanyuan'"):
+        ingest.ingest_directory(data_dir, tmp_path / "store", workers=1)
+    # The dataset from before is left in place, and no staging directory remains
+    assert len(store.read_dataset("raw", store_dir=tmp_path / "store")) == 500
+    assert sorted(p.name for p in (tmp_path / "store").iterdir()) == ["raw", store.STATIONS_FILE]
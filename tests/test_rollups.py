@@ -0,0 +1,35 @@
+import pandas as pd
+
+from airquality import incremental, rollups
+
+
+def split(urban_csv):
+    # Cut mid-month and mid-day, so both halves share rollup keys
+    df = incremental.prepare_batch(urban_csv, "Urban").dropna().reset_index(drop=True)
+    cut = len(df) // 2 + 7
+    return df, df.iloc[:cut], df.iloc[cut:]
+
+
+def test_merge_equals_compute_on_concatenated_rows(urban_csv):
+    df, first, second = split(urban_csv)
+    merged = rollups.merge(rollups.compute(first), rollups.compute(second))
+    full = rollups.compute(df)
+    pd.testing.assert_frame_equal(merged, full, check_dtype=False)
+
+
+def test_merged_histograms_equal_histograms_of_all_rows(urban_csv):
+    df, first, second = split(urban_csv)
+    merged = rollups.merge(rollups.compute_histograms(first), rollups.compute_histograms(second),
+                           keys=rollups.HIST_KEYS)
+    full = rollups.compute_histograms(df).sort_values(rollups.HIST_KEYS, ignore_index=True)
+    pd.testing.assert_frame_equal(merged[full.columns], full, check_dtype=False)
+
+
+def test_derived_statistics_match_pandas(urban_csv):
+    df, _, _ = split(urban_csv)
+    summary = rollups.compute(df)
+    pd.testing.assert_frame_equal(rollups.corr(summary, ["PM2.5", "NO2", "O3"]),
+                                  df[["PM2.5", "NO2", "O3"]].astype("float64").corr())
+    hourly = rollups.means(summary, "hour", ["PM2.5"]).set_index("hour")["PM2.5"]
+    expected = df["PM2.5"].astype("float64").groupby(df["datetime"].dt.hour).mean()
+    pd.testing.assert_series_equal(hourly, expected, check_names=False, check_index_type=False)
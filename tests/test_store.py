@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from airquality import store
+
+
+def mapped_ranges(path):
+    """Address ranges at which this process maps ``path``, from /proc/self/maps."""
+    ranges = []
+    with open("/proc/self/maps") as maps:
+        for line in maps:
+            fields = line.split()
+            if len(fields) >= 6 and fields[5] == str(path):
+                start, end = (int(x, 16) for x in fields[0].split("-"))
+                ranges.append((start, end))
+    return ranges
+
+
+@pytest.fixture
+def readings():
+    # Two station types written out of order, with missing values in a float column
+    n = 48
+    return pd.DataFrame({
+        "station_type": ["Rural"] * n + ["Urban"] * n,
+        "station": ["Huairou"] * n + ["Guanyuan"] * n,
+        "datetime": list(pd.date_range("2016-01-01", periods=n, freq="h")) * 2,
+        "PM2.5": np.where(np.arange(2 * n) % 5 == 0, np.nan, np.arange(2 * n)).astype("float32"),
+    })
+
+
+@pytest.mark.skipif(not Path("/proc/self/maps").exists(), reason="needs /proc/self/maps")
+def test_load_shared_float_column_is_not_copied(tmp_path, readings):
+    store.write_dataset(readings, "raw", tmp_path)
+    df = store.load_shared("raw", store_dir=tmp_path)
+    address = df["PM2.5"].to_numpy().__array_interface__["data"][0]
+    ranges = mapped_ranges(store.snapshot_path("raw", tmp_path).resolve())
+    assert any(start <= address < end for start, end in ranges)
+    assert df["PM2.5"].isna().sum() == readings["PM2.5"].isna().sum()
+
+
+def test_load_shared_orders_station_types_as_blocks(tmp_path, readings):
+    store.write_dataset(readings, "raw", tmp_path)
+    df = store.load_shared("raw", store_dir=tmp_path)
+    urban = store.station_slice(df, "Urban", "Guanyuan")
+    assert len(urban) == 48 and set(urban["station"]) == {"Guanyuan"}
+    assert urban["datetime"].is_monotonic_increasing